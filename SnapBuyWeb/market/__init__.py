@@ -1,3 +1,4 @@
+import os
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
@@ -8,6 +9,8 @@ app = Flask(__name__)
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///snapbuy.db'
 
 app.config['SECRET_KEY'] = 'd56a38d96c8b6ca655497ba6689cfd7ea3d45bd6acf97c4dadfaf006e51ecd36'
+# Đặt ML_WARMUP=1 để nạp sẵn model gợi ý khi worker khởi động (mặc định tắt để lệnh flask db ... chạy nhanh)
+app.config['ML_WARMUP'] = os.environ.get('ML_WARMUP', '0') == '1'
 
 
 db = SQLAlchemy(app)
@@ -19,3 +22,7 @@ login_manager.login_view = 'login_by_user'
 
 
 from market import routes
+
+if app.config['ML_WARMUP']:
+    from market.warmup import warm_up
+    warm_up(app)
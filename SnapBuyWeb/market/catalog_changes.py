@@ -0,0 +1,64 @@
+from sqlalchemy import event, func, inspect, select
+from market import db
+from market.models import CatalogChange, Category, Item
+
+# Chỉ giữ chừng này dòng gần nhất; worker tụt lại xa hơn thì không đồng bộ từng phần được mà phải build lại
+CHANGE_LOG_SIZE = 10000
+
+catalog_change = CatalogChange.__table__
+
+_available = None
+
+
+def change_log_available():
+    global _available
+    if _available is None:
+        _available = inspect(db.engine).has_table(catalog_change.name)
+    return _available
+
+
+def latest_change_id():
+    return db.session.query(func.max(CatalogChange.id)).scalar() or 0
+
+
+def changes_since(change_id):
+    # Trả về (id mới nhất, tập item_id đã đổi sau change_id); None nếu phần nhật ký cần đọc đã bị dọn
+    oldest, latest = db.session.query(func.min(CatalogChange.id), func.max(CatalogChange.id)).one()
+    if latest is None or latest <= change_id:
+        return change_id, set()
+    if oldest > change_id + 1:
+        return None
+    item_ids = db.session.execute(
+        select(CatalogChange.item_id).where(CatalogChange.id > change_id, CatalogChange.id <= latest)
+    ).scalars()
+    return latest, set(item_ids)
+
+
+# Ghi nhật ký trong cùng transaction với thay đổi ORM giống chỉ mục tìm kiếm (market/search.py):
+# rollback thì dòng nhật ký cũng mất. Thay đổi bằng SQL thô không được ghi, khi đó restart worker để build lại.
+@event.listens_for(db.session, 'before_flush')
+def _collect_category_changes(session, flush_context, instances):
+    # Văn bản gợi ý của item chứa tên danh mục: lấy item của danh mục bị đổi tên/xoá trước khi flush
+    if not change_log_available():
+        return
+    pending = session.info.setdefault('catalog_changes', set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Category) and (obj in session.deleted or inspect(obj).attrs.name.history.has_changes()):
+            pending.update(session.connection().execute(
+                select(Item.id).where(Item.category_id == obj.id)).scalars())
+
+
+@event.listens_for(db.session, 'after_flush')
+def _log_catalog_changes(session, flush_context):
+    if not change_log_available():
+        return
+    pending = session.info.pop('catalog_changes', set())
+    pending.update(obj.id for obj in list(session.new) + list(session.dirty) + list(session.deleted)
+                   if isinstance(obj, Item))
+    if not pending:
+        return
+
+    connection = session.connection()
+    connection.execute(catalog_change.insert(), [{'item_id': item_id} for item_id in sorted(pending)])
+    newest = select(func.max(catalog_change.c.id)).scalar_subquery()
+    connection.execute(catalog_change.delete().where(catalog_change.c.id <= newest - CHANGE_LOG_SIZE))
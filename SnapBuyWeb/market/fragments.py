@@ -0,0 +1,49 @@
+from flask import render_template
+from markupsafe import Markup
+from market.cache import TTLCache
+from market.metadata import get_metadata
+from market.models import Item
+from market.versions import catalog_stamp
+
+PRICE_FILTERS = ('asc', 'desc')
+FRAGMENT_CACHE_SIZE = 64
+FRAGMENT_CACHE_TTL = 3600.0
+FEATURED_CATEGORY_COUNT = 10
+MARKET_ITEM_COUNT = 16
+
+# (phiên bản catalog, tên fragment, tham số) -> HTML đã render
+fragment_cache = TTLCache(maxsize=FRAGMENT_CACHE_SIZE, ttl=FRAGMENT_CACHE_TTL)
+
+
+def catalog_version():
+    return catalog_stamp.current()
+
+
+def bump_catalog_version():
+    return catalog_stamp.bump()
+
+
+def cached_fragment(name, params, render):
+    key = (catalog_version(), name, params)
+    return fragment_cache.get_or_compute(key, lambda: Markup(render()))
+
+
+def _render_market_catalog(price_filter):
+    featured_categories = get_metadata().categories[:FEATURED_CATEGORY_COUNT]
+
+    query = Item.query
+    if price_filter == 'asc':
+        query = query.order_by(Item.price.asc())
+    elif price_filter == 'desc':
+        query = query.order_by(Item.price.desc())
+    items = query.limit(MARKET_ITEM_COUNT).all()
+
+    return render_template('user/market_catalog.html',
+                           featured_categories=featured_categories, items=items)
+
+
+def market_catalog_html(price_filter):
+    # Giá trị lạ của price_filter được coi như không lọc, nên cache có tối đa 3 biến thể cho mỗi phiên bản
+    if price_filter not in PRICE_FILTERS:
+        price_filter = None
+    return cached_fragment('market_catalog', price_filter, lambda: _render_market_catalog(price_filter))
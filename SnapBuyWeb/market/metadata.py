@@ -0,0 +1,60 @@
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+from market import db
+from market.models import Category, Brand, Tag
+from market.versions import VersionStamp
+
+# Bản ghi chỉ đọc, không gắn với session nên dùng được ở mọi request và thread
+CategoryRow = namedtuple('CategoryRow', 'id name description')
+BrandRow = namedtuple('BrandRow', 'id name')
+TagRow = namedtuple('TagRow', 'id name')
+
+metadata_stamp = VersionStamp('metadata')
+
+
+class MetadataSnapshot:
+    # Ảnh chụp bất biến của các bảng nhỏ category/brand/tag tại một phiên bản
+
+    def __init__(self, version, categories, brands, tags):
+        self.version = version
+        self.categories = tuple(categories)
+        self.brands = tuple(brands)
+        self.tags = tuple(tags)
+        self.categories_by_id = MappingProxyType({category.id: category for category in self.categories})
+        self.brands_by_id = MappingProxyType({brand.id: brand for brand in self.brands})
+        self.tags_by_id = MappingProxyType({tag.id: tag for tag in self.tags})
+
+    @classmethod
+    def load(cls, version):
+        categories = db.session.query(Category.id, Category.name, Category.description).order_by(Category.id).all()
+        brands = db.session.query(Brand.id, Brand.name).order_by(Brand.id).all()
+        tags = db.session.query(Tag.id, Tag.name).order_by(Tag.id).all()
+        return cls(
+            version,
+            [CategoryRow(*row) for row in categories],
+            [BrandRow(*row) for row in brands],
+            [TagRow(*row) for row in tags],
+        )
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_metadata():
+    # Đọc phiên bản trước rồi mới nạp dữ liệu: nếu có bump xen giữa thì lần kiểm tra sau sẽ nạp lại
+    global _snapshot
+    version = metadata_stamp.current()
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    with _snapshot_lock:
+        if _snapshot is None or _snapshot.version != version:
+            _snapshot = MetadataSnapshot.load(version)
+        return _snapshot
+
+
+def invalidate_metadata():
+    metadata_stamp.bump()
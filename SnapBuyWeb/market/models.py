@@ -108,3 +108,40 @@ class UserHistory(db.Model):
 
     def __repr__(self):
         return f"<UserHistory {self.user_id} -> {self.item_id} [{self.interaction_type}]>"
+
+
+class UserRecommendation(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    recommender = db.Column(db.String(20), nullable=False)
+    rank = db.Column(db.Integer, nullable=False)
+    item_id = db.Column(db.Integer, db.ForeignKey('item.id'), nullable=False)
+    score = db.Column(db.Float)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_user_recommendation_user_rank', 'user_id', 'recommender', 'rank'),
+    )
+
+    def __repr__(self):
+        return f"<UserRecommendation {self.user_id} [{self.recommender}] #{self.rank} -> {self.item_id}>"
+
+
+class CacheVersion(db.Model):
+    name = db.Column(db.String(50), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f"<CacheVersion {self.name} v{self.version}>"
+
+
+class CatalogChange(db.Model):
+    # Nhật ký item được thêm/sửa/xoá (kể cả item có danh mục bị đổi tên) để mỗi worker chỉ đồng bộ phần thay đổi
+    id = db.Column(db.Integer, primary_key=True)
+    item_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+    def __repr__(self):
+        return f"<CatalogChange #{self.id} item {self.item_id}>"
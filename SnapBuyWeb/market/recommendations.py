@@ -0,0 +1,179 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from flask import current_app
+from market import db
+from market.cache import TTLCache
+from sqlalchemy import func, or_
+from market.models import Item, UserHistory, UserRecommendation
+from market.versions import bump_versions, read_versions
+
+RECOMMENDERS = ('content', 'mind', 'ratings')
+
+# Thời gian chờ tối đa (giây) cho từng recommender tính từ lúc gửi đi; quá hạn thì trang dùng danh sách dự phòng
+RECOMMENDER_TIMEOUTS = {'content': 0.3, 'mind': 0.3, 'ratings': 0.5}
+MAX_RECOMMENDER_THREADS = 8
+# Số việc tối đa đang chờ hoặc đang chạy trong executor; đầy thì request dùng ngay danh sách dự phòng
+MAX_PENDING_RECOMMENDATIONS = 32
+RECOMMENDATION_CACHE_SIZE = 10000
+RECOMMENDATION_CACHE_TTL = 600.0
+
+# Dùng chung cho mọi request. Hàng đợi của executor không giới hạn nên số việc được gửi vào bị chặn bằng _slots;
+# việc quá hạn chưa chạy thì bị huỷ, đang chạy thì chạy nốt (vẫn giữ slot) và kết quả được lưu cache
+_executor = ThreadPoolExecutor(max_workers=MAX_RECOMMENDER_THREADS, thread_name_prefix='recommender')
+_slots = threading.BoundedSemaphore(MAX_PENDING_RECOMMENDATIONS)
+
+# (user_id, kind, phiên bản, top_n) -> danh sách id. Phiên bản nằm trong bảng cache_version và được tăng khi
+# user mua hàng, xem hoặc đánh giá sản phẩm, nên entry cũ ở mọi worker process đều không còn được dùng
+recommendation_cache = TTLCache(maxsize=RECOMMENDATION_CACHE_SIZE, ttl=RECOMMENDATION_CACHE_TTL)
+
+
+class ModelUnavailable(Exception):
+    # Recommender chưa nạp được model: không lưu cache để lần sau thử lại khi model đã sẵn sàng
+    pass
+
+
+def _recommendation_ids(kind):
+    # Import lười: chỉ nạp pandas/scikit-learn khi thực sự phải tính trực tiếp
+    if kind == 'content':
+        from model_ml.content_recommender import content_recommendation_ids
+        return lambda user_id, purchased_item_ids, top_n: content_recommendation_ids(purchased_item_ids, top_n)
+    if kind == 'mind':
+        from model_ml.mind_recommender import mind_recommendation_ids
+        return mind_recommendation_ids
+    from model_ml.ratings_recommender import ratings_recommendation_ids
+    return ratings_recommendation_ids
+
+
+def _run_in_app_context(app, func, *args):
+    # Mỗi thread có app context (và session SQLAlchemy) riêng, không dùng chung object ORM của request
+    with app.app_context():
+        return func(*args)
+
+
+def _version_name(user_id, kind):
+    return f'recommendations:{user_id}:{kind}'
+
+
+def _user_versions(user_id, kinds):
+    versions = read_versions([_version_name(user_id, kind) for kind in kinds])
+    return {kind: versions[_version_name(user_id, kind)] for kind in kinds}
+
+
+def _compute_ids(app, kind, user_id, purchased_item_ids, top_n):
+    item_ids = _run_in_app_context(app, _recommendation_ids(kind), user_id, purchased_item_ids, top_n)
+    if item_ids is None:
+        raise ModelUnavailable(kind)
+    return item_ids
+
+
+def _cached_compute(app, kind, key, user_id, purchased_item_ids, top_n):
+    # Các request cùng lúc của một user chỉ tính một lần; kết quả về muộn (quá hạn) vẫn được lưu cho lần sau
+    return recommendation_cache.get_or_compute(
+        key, lambda: _compute_ids(app, kind, user_id, purchased_item_ids, top_n)
+    )
+
+
+def _submit(*args):
+    if not _slots.acquire(blocking=False):
+        return None
+    try:
+        future = _executor.submit(_cached_compute, *args)
+    except BaseException:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    return future
+
+
+def _fallback_ids(purchased_item_ids, top_n):
+    from model_ml.popularity import cached_popular_item_ids
+    return cached_popular_item_ids(top_n, exclude_ids=purchased_item_ids)
+
+
+def load_precomputed(user_id, top_n=5, kinds=RECOMMENDERS):
+    # Dòng MIND tính trước lượt xem gần nhất của user đã cũ: bỏ qua để tính trực tiếp (không xoá, lượt xem không phải ghi DB)
+    last_view = db.session.query(func.max(UserHistory.timestamp)) \
+        .filter(UserHistory.user_id == user_id).scalar_subquery()
+    rows = db.session.query(UserRecommendation.recommender, Item) \
+        .join(Item, Item.id == UserRecommendation.item_id) \
+        .filter(UserRecommendation.user_id == user_id, UserRecommendation.rank < top_n,
+                UserRecommendation.recommender.in_(kinds),
+                or_(UserRecommendation.recommender != 'mind', last_view.is_(None),
+                    UserRecommendation.created_at >= last_view)) \
+        .order_by(UserRecommendation.recommender, UserRecommendation.rank) \
+        .all()
+
+    precomputed = {}
+    for kind, item in rows:
+        precomputed.setdefault(kind, []).append(item)
+    return precomputed
+
+
+def compute_recommendation_ids(user_id, purchased_item_ids, kinds=RECOMMENDERS, top_n=5):
+    # Gửi các recommender chạy song song, mỗi cái chỉ được chờ tới hạn của riêng nó
+    app = current_app._get_current_object()
+    keys = {kind: (user_id, kind, version, top_n) for kind, version in _user_versions(user_id, kinds).items()}
+    results = {}
+    for kind, key in keys.items():
+        cached = recommendation_cache.get(key)
+        if cached is not None:
+            results[kind] = cached
+
+    started = time.monotonic()
+    futures = {
+        kind: _submit(app, kind, keys[kind], user_id, purchased_item_ids, top_n)
+        for kind in kinds if kind not in results
+    }
+    for kind, future in futures.items():
+        if future is None:
+            app.logger.warning('Recommender %s quá tải, dùng danh sách dự phòng cho user %s', kind, user_id)
+            results[kind] = _fallback_ids(purchased_item_ids, top_n)
+            continue
+        remaining = max(0.0, started + RECOMMENDER_TIMEOUTS[kind] - time.monotonic())
+        try:
+            results[kind] = future.result(timeout=remaining)
+        except ModelUnavailable:
+            app.logger.warning('Recommender %s chưa có model, dùng danh sách dự phòng', kind)
+            results[kind] = _fallback_ids(purchased_item_ids, top_n)
+        except TimeoutError:
+            future.cancel()
+            app.logger.warning('Recommender %s quá %.1fs cho user %s, dùng danh sách dự phòng',
+                               kind, RECOMMENDER_TIMEOUTS[kind], user_id)
+            results[kind] = _fallback_ids(purchased_item_ids, top_n)
+        except Exception:
+            app.logger.exception('Recommender %s lỗi cho user %s', kind, user_id)
+            results[kind] = _fallback_ids(purchased_item_ids, top_n)
+    return results
+
+
+def get_recommendations(user, top_n=5, kinds=RECOMMENDERS):
+    # Đọc kết quả tính sẵn bằng 1 query; recommender nào chưa có dòng cho user, hoặc lưu ít hơn top_n hạng
+    # (precompute_recommendations chỉ lưu --top-n hạng, mặc định 10), thì mới tính trực tiếp
+    precomputed = load_precomputed(user.id, top_n, kinds)
+    missing = [kind for kind in kinds if len(precomputed.get(kind, ())) < top_n]
+    if not missing:
+        return precomputed
+
+    from model_ml.hydration import hydrate_items
+    purchased_item_ids = {order.item_id for order in user.orders}
+    computed = compute_recommendation_ids(user.id, purchased_item_ids, missing, top_n)
+
+    # Thread chỉ trả id; lấy item cho mọi recommender bằng 1 câu IN trong thread của request
+    items_by_id = {item.id: item for item in hydrate_items(item_id for ids in computed.values() for item_id in ids)}
+    for kind, item_ids in computed.items():
+        precomputed[kind] = [items_by_id[item_id] for item_id in item_ids if item_id in items_by_id]
+    return precomputed
+
+
+def invalidate_cached(user_id, kinds=RECOMMENDERS):
+    # Tăng phiên bản trong DB (mọi worker thấy ngay ở request sau) và commit cùng các thay đổi đang chờ của session
+    bump_versions([_version_name(user_id, kind) for kind in kinds])
+
+
+def invalidate_precomputed(user_id, kinds=RECOMMENDERS):
+    UserRecommendation.query.filter(
+        UserRecommendation.user_id == user_id,
+        UserRecommendation.recommender.in_(kinds)
+    ).delete(synchronize_session=False)
+    invalidate_cached(user_id, kinds)
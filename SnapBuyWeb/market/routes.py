@@ -1,18 +1,21 @@
-import numpy as np
+import click
 from flask_login import login_user, logout_user, current_user, login_required
 from market import app, db
-from flask import request, render_template, redirect, url_for, flash, session, Blueprint, jsonify
-from market.models import Item, User, Order, Category, Rating, Tag, Brand, UserHistory
+from flask import request, render_template, redirect, url_for, flash, session, Blueprint, jsonify, abort
+from market.models import Item, User, Order, Category, Rating, Tag, Brand, UserHistory, UserRecommendation
+from market.recommendations import RECOMMENDERS, get_recommendations, invalidate_cached, invalidate_precomputed
 from market.forms import AdminRegisterForm, AdminLoginForm, ItemForm, UserRegisterForm, UserLoginForm, OrderForm, CategoryForm, RatingForm, TagForm, BrandForm
 from market.decorators import admin_required
+from market.fragments import bump_catalog_version, market_catalog_html
+from market.metadata import get_metadata, invalidate_metadata
+from market.search import filter_by_keyword, rebuild_search_index
+from market import catalog_changes  # đăng ký event ghi nhật ký catalog_change
 from sqlalchemy.orm import joinedload
-from sklearn.metrics.pairwise import linear_kernel
-import pickle
 import os
 from datetime import datetime, timedelta
 from functools import wraps
 from werkzeug.security import generate_password_hash
-from sqlalchemy import or_, func
+from sqlalchemy import func
 
 tag_bp = Blueprint('tag', __name__, url_prefix='/tags')
 brand_bp = Blueprint('brand', __name__, url_prefix='/brands')
@@ -27,6 +30,53 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def _bump_catalog_version():
+    # Item đã được commit: tăng phiên bản lỗi (vd. SQLite đang bị khoá) chỉ ghi log, cache sẽ hết hạn theo TTL
+    try:
+        bump_catalog_version()
+    except Exception:
+        db.session.rollback()
+        app.logger.exception('Không thể tăng phiên bản catalog')
+
+# Chỉ mục gợi ý nội dung tự đồng bộ theo nhật ký catalog_change (ghi cùng transaction) khi thấy phiên bản catalog đổi
+def _on_item_saved(item, created=False):
+    from model_ml.catalog import invalidate_catalog
+    if created:
+        invalidate_catalog()
+    _bump_catalog_version()
+
+def _on_item_deleted(item_id):
+    from model_ml.catalog import invalidate_catalog
+    invalidate_catalog()
+    _bump_catalog_version()
+
+def _on_metadata_changed(catalog=False):
+    # Category còn xuất hiện trong fragment của trang market nên phải tăng cả phiên bản catalog
+    try:
+        invalidate_metadata()
+    except Exception:
+        db.session.rollback()
+        app.logger.exception('Không thể tăng phiên bản cache danh mục')
+    if catalog:
+        _bump_catalog_version()
+
+def _on_item_viewed(user_id, item_id):
+    from model_ml.mind_recommender import record_view
+    try:
+        record_view(user_id, item_id)
+        # Dòng MIND tính sẵn cũ hơn lượt xem này tự bị load_precomputed bỏ qua, chỉ cần tăng phiên bản cache
+        invalidate_cached(user_id, ('mind',))
+    except Exception:
+        db.session.rollback()
+        app.logger.exception('Không thể cập nhật hồ sơ MIND cho user %s', user_id)
+
+def _on_item_rated(user_id):
+    try:
+        invalidate_cached(user_id, ('ratings',))
+    except Exception:
+        db.session.rollback()
+        app.logger.exception('Không thể xoá cache gợi ý theo đánh giá cho user %s', user_id)
+
 @app.route('/admin/dashboard')
 @admin_required
 def dashboard_page():
@@ -73,54 +123,51 @@ def analyze_page():
 @app.route('/')
 @app.route('/market')
 def market_page():
-    from model_ml.content_recommender import get_content_recommendations
-    from model_ml.mind_recommender import get_mind_recommendations
-    from model_ml.ratings_recommender import get_ratings_recommendations
-
-    if current_user.is_authenticated:
-        recommended_items = get_content_recommendations(current_user, top_n=5)
-        mind_items = get_mind_recommendations(current_user, top_n=5)
-        ratings_items = get_ratings_recommendations(current_user, top_n=5)
-    else:
-        recommended_items = []
-        mind_items = []
-        ratings_items = []
-
-    latest_items = Item.query.order_by(Item.created_at.desc()).limit(10).all()
-
-    categories = Category.query.all()
-    featured_categories = categories[:10]
-
+    # Các carousel gợi ý được tải sau bằng /api/recommendations/<kind>, trang không phải chờ model.
+    # Danh mục và lưới sản phẩm giống nhau cho mọi người xem nên được lấy từ cache fragment.
     price_filter = request.args.get('price_filter')
-    query = Item.query
-    if price_filter == 'asc':
-        query = query.order_by(Item.price.asc())
-    elif price_filter == 'desc':
-        query = query.order_by(Item.price.desc())
-    items = query.limit(16).all()
-
-    suggested_items = Item.query.order_by(Item.id.desc()).limit(8).all()
+    catalog_html = market_catalog_html(price_filter)
 
     recently_viewed_ids = session.get('viewed_items', [])
-    recently_viewed_items = Item.query.filter(Item.id.in_(recently_viewed_ids)).all()
-    id_order = {id_: i for i, id_ in enumerate(recently_viewed_ids)}
-    recently_viewed_items.sort(key=lambda x: id_order.get(x.id, 0))
+    recently_viewed_items = []
+    if recently_viewed_ids:
+        recently_viewed_items = Item.query.filter(Item.id.in_(recently_viewed_ids)).all()
+        id_order = {id_: i for i, id_ in enumerate(recently_viewed_ids)}
+        recently_viewed_items.sort(key=lambda x: id_order.get(x.id, 0))
 
     return render_template(
         'user/market.html',
-        items=items,
-        categories=categories,
-        featured_categories=featured_categories,
-        suggested_items=suggested_items,
+        catalog_html=catalog_html,
         recently_viewed=recently_viewed_items,
         selected_category=None,
         price_filter=price_filter,
-        latest_items=latest_items,
-        recommended_items=recommended_items,
-        mind_items=mind_items,
-        ratings_items=ratings_items
+        show_recommendations=True
     )
 
+@app.route('/api/recommendations/<kind>')
+@login_required
+def recommendations_api(kind):
+    if kind not in RECOMMENDERS:
+        return jsonify({'error': f'Không có recommender {kind}'}), 404
+    top_n = min(max(request.args.get('top_n', 5, type=int), 1), 20)
+
+    items = get_recommendations(current_user, top_n=top_n, kinds=(kind,))[kind]
+    response = jsonify({
+        'kind': kind,
+        'items': [{
+            'id': item.id,
+            'name': item.name,
+            'price': float(item.price) if item.price is not None else None,
+            'image_url': item.image_url,
+            'url': url_for('product_detail', item_id=item.id),
+        } for item in items]
+    })
+    # Danh sách không đổi thì trình duyệt nhận 304, không tải lại body
+    response.add_etag()
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Cookie')
+    return response.make_conditional(request)
+
 @app.route('/items')
 @admin_required
 def item_list():
@@ -138,9 +185,10 @@ def item_list():
 @admin_required
 def add_item():
     form = ItemForm()
-    form.category_id.choices = [(c.id, c.name) for c in Category.query.all()]
-    form.brand_id.choices = [(b.id, b.name) for b in Brand.query.all()]
-    form.tag_ids.choices = [(t.id, t.name) for t in Tag.query.all()]
+    metadata = get_metadata()
+    form.category_id.choices = [(c.id, c.name) for c in metadata.categories]
+    form.brand_id.choices = [(b.id, b.name) for b in metadata.brands]
+    form.tag_ids.choices = [(t.id, t.name) for t in metadata.tags]
 
     if form.validate_on_submit():
         try:
@@ -158,6 +206,7 @@ def add_item():
 
             db.session.add(item)
             db.session.commit()
+            _on_item_saved(item, created=True)
 
             flash(f'Item "{item.name}" đã được thêm thành công!', 'success')
             return redirect(url_for('item_list'))
@@ -174,9 +223,10 @@ def edit_item(id):
     item = Item.query.get_or_404(id)
     form = ItemForm(obj=item)
 
-    form.category_id.choices = [(c.id, c.name) for c in Category.query.all()]
-    form.brand_id.choices = [(b.id, b.name) for b in Brand.query.all()]
-    form.tag_ids.choices = [(t.id, t.name) for t in Tag.query.all()]
+    metadata = get_metadata()
+    form.category_id.choices = [(c.id, c.name) for c in metadata.categories]
+    form.brand_id.choices = [(b.id, b.name) for b in metadata.brands]
+    form.tag_ids.choices = [(t.id, t.name) for t in metadata.tags]
 
     if request.method == 'GET':
         form.category_id.data = item.category_id
@@ -194,6 +244,7 @@ def edit_item(id):
             item.tags = Tag.query.filter(Tag.id.in_(form.tag_ids.data)).all()
 
             db.session.commit()
+            _on_item_saved(item)
             flash(f'Sản phẩm "{item.name}" đã được cập nhật thành công!', 'success')
             return redirect(url_for('item_list'))
         except Exception as e:
@@ -209,8 +260,10 @@ def delete_item(id):
     item_name = item.name
     try:
         Order.query.filter_by(item_id=id).delete()
+        UserRecommendation.query.filter_by(item_id=id).delete()
         db.session.delete(item)
         db.session.commit()
+        _on_item_deleted(id)
         flash(f'Item "{item_name}" has been deleted successfully!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -246,6 +299,7 @@ def add_brand():
         brand = Brand(name=form.name.data)
         db.session.add(brand)
         db.session.commit()
+        _on_metadata_changed()
         flash('Brand added!', 'success')
         return redirect(url_for('list_brands'))
     return render_template('brand/add.html', form=form)
@@ -258,6 +312,7 @@ def edit_brand(id):
     if form.validate_on_submit():
         brand.name = form.name.data
         db.session.commit()
+        _on_metadata_changed()
         flash('Brand updated!', 'success')
         return redirect(url_for('list_brands'))
     return render_template('brand/edit.html', form=form, brand=brand)
@@ -268,6 +323,7 @@ def delete_brand(id):
     brand = Brand.query.get_or_404(id)
     db.session.delete(brand)
     db.session.commit()
+    _on_metadata_changed()
     flash('Brand deleted!', 'success')
     return redirect(url_for('list_brands'))
 
@@ -300,6 +356,7 @@ def add_tag():
         tag = Tag(name=form.name.data)
         db.session.add(tag)
         db.session.commit()
+        _on_metadata_changed()
         flash('Tag added successfully!', 'success')
         return redirect(url_for('list_tags'))
     return render_template('tag/add.html', form=form)
@@ -312,6 +369,7 @@ def edit_tag(id):
     if form.validate_on_submit():
         tag.name = form.name.data
         db.session.commit()
+        _on_metadata_changed()
         flash('Tag updated!', 'success')
         return redirect(url_for('list_tags'))
     return render_template('tag/edit.html', form=form, tag=tag)
@@ -322,6 +380,7 @@ def delete_tag(id):
     tag = Tag.query.get_or_404(id)
     db.session.delete(tag)
     db.session.commit()
+    _on_metadata_changed()
     flash('Tag deleted!', 'success')
     return redirect(url_for('list_tags'))
 
@@ -424,6 +483,7 @@ def product_detail(item_id):
         )
         db.session.add(new_history)
         db.session.commit()
+        _on_item_viewed(current_user.id, item.id)
 
     viewed = session.get('viewed_items', [])
     if item_id in viewed:
@@ -594,6 +654,7 @@ def checkout():
                 )
                 db.session.add(order)
             db.session.commit()
+            invalidate_precomputed(current_user.id)
             session.pop('cart', None)
             flash('Đơn hàng của bạn đã được đặt thành công!', 'success')
             return redirect(url_for('order_confirmation'))
@@ -646,6 +707,7 @@ def add_category():
             try:
                 db.session.add(new_category)
                 db.session.commit()
+                _on_metadata_changed(catalog=True)
                 flash('✅ Danh mục mới đã được thêm thành công!', 'success')
                 return redirect(url_for('category_list'))
             except Exception as e:
@@ -664,6 +726,7 @@ def edit_category(id):
         category.name = form.name.data
         category.description = form.description.data
         db.session.commit()
+        _on_metadata_changed(catalog=True)
         flash('Danh mục đã được cập nhật!', 'success')
         return redirect(url_for('category_list'))
 
@@ -676,6 +739,7 @@ def delete_category(id):
     try:
         db.session.delete(category)
         db.session.commit()
+        _on_metadata_changed(catalog=True)
         flash('Đã xoá danh mục thành công!', 'success')
     except Exception as e:
         db.session.rollback()
@@ -729,6 +793,7 @@ def rate_order(order_id):
         )
         db.session.add(rating)
         db.session.commit()
+        _on_item_rated(current_user.id)
         flash('Cảm ơn bạn đã đánh giá. Chúc bạn mua sắm vui vẻ!', 'success')
         return redirect(url_for('view_orders'))
 
@@ -854,9 +919,12 @@ def rate_order(order_id):
 
 @app.route('/categories/<int:category_id>')
 def category_detail(category_id):
-    category = Category.query.get_or_404(category_id)
+    metadata = get_metadata()
+    category = metadata.categories_by_id.get(category_id)
+    if category is None:
+        abort(404)
     items = Item.query.filter_by(category_id=category.id).all()
-    categories = Category.query.all()
+    categories = metadata.categories
 
     return render_template('user/market.html', items=items, categories=categories, selected_category=category)
 @app.route('/category/<string:category_name>')
@@ -915,6 +983,62 @@ def cleanup_inactive_users():
     db.session.commit()
     print(f"Cleaned up {len(inactive_users)} inactive users")
 
+@app.cli.command('precompute_recommendations')
+@click.option('--top-n', default=10, show_default=True, help='Số gợi ý lưu cho mỗi user.')
+@click.option('--block-size', default=256, show_default=True, help='Số user trong mỗi block gửi cho worker.')
+@click.option('--workers', default=None, type=int, help='Số process (mặc định = số CPU).')
+@click.option('--kind', 'kinds', multiple=True, type=click.Choice(['content', 'mind', 'ratings']))
+def precompute_recommendations_command(top_n, block_size, workers, kinds):
+    """Tính sẵn top-N gợi ý cho mọi user vào bảng user_recommendation (chạy hằng đêm)."""
+    from model_ml.batch_recommender import RECOMMENDERS, precompute_recommendations
+    summary = precompute_recommendations(kinds or RECOMMENDERS, top_n=top_n, block_size=block_size, workers=workers)
+    for kind, n_users in summary.items():
+        print(f"[{kind}] Đã lưu gợi ý cho {n_users} user")
+
+@app.cli.command('warm_up')
+def warm_up_command():
+    """Nạp và kiểm tra toàn bộ artifact gợi ý, in thời gian từng bước."""
+    from market.warmup import warm_up
+    if not all(ok for _, ok, _, _ in warm_up(app)):
+        raise SystemExit(1)
+
+@app.cli.command('benchmark_recommenders')
+@click.option('--k', default=5, show_default=True, help='Số gợi ý được đánh giá cho mỗi user.')
+@click.option('--test-ratio', default=0.2, show_default=True, help='Tỉ lệ đơn hàng mới nhất dùng làm tập test.')
+@click.option('--max-users', default=None, type=int, help='Giới hạn số user được đánh giá.')
+@click.option('--memory-users', default=50, show_default=True, help='Số user dùng để đo bộ nhớ đỉnh.')
+@click.option('--kind', 'kinds', multiple=True, type=click.Choice(['content', 'mind', 'ratings']))
+def benchmark_recommenders_command(k, test_ratio, max_users, memory_users, kinds):
+    """Đánh giá chất lượng (precision/recall/NDCG@k) và độ trễ của các recommender trên tập test chia theo thời gian."""
+    from model_ml.benchmark import run_benchmark
+    results, n_users, cutoff = run_benchmark(kinds or None, k=k, test_ratio=test_ratio, max_users=max_users,
+                                             memory_users=memory_users)
+    print(f"Đánh giá {n_users} user, đơn hàng từ {cutoff} trở đi là tập test")
+    print(f"{'recommender':<12}{'P@k':>8}{'R@k':>8}{'NDCG@k':>8}{'hit':>8}{'cover':>8}"
+          f"{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'peak KB':>10}")
+    for kind, r in results.items():
+        print(f"{kind:<12}{r['precision']:>8.4f}{r['recall']:>8.4f}{r['ndcg']:>8.4f}{r['hit_rate']:>8.4f}"
+              f"{r['coverage']:>8.2f}{r['p50_ms']:>9.2f}{r['p90_ms']:>9.2f}{r['p99_ms']:>9.2f}{r['peak_mem_kb']:>10.1f}")
+
+@app.cli.command('rebuild_search_index')
+def rebuild_search_index_command():
+    """Dựng lại chỉ mục tìm kiếm FTS5 từ bảng item (sau khi nhập dữ liệu bằng SQL thô)."""
+    with db.engine.begin() as connection:
+        n_items = rebuild_search_index(connection)
+    print(f"Đã đánh chỉ mục {n_items} sản phẩm")
+
+@app.cli.command('benchmark_search')
+@click.option('--items', 'n_items', default=100000, show_default=True, help='Số sản phẩm giả lập trong DB tạm.')
+@click.option('--repeats', default=5, show_default=True, help='Số lần chạy lại mỗi từ khoá.')
+def benchmark_search_command(n_items, repeats):
+    """So sánh tìm kiếm LIKE và FTS5 trên một DB SQLite tạm với dữ liệu giả lập."""
+    from market.search_benchmark import QUERIES, run_search_benchmark
+    results, build_seconds = run_search_benchmark(n_items, repeats)
+    print(f"Dựng DB tạm {n_items} sản phẩm + chỉ mục FTS trong {build_seconds:.1f}s, {len(QUERIES)} từ khoá x {repeats} lần")
+    print(f"{'path':<6}{'p50 ms':>9}{'p90 ms':>9}{'max ms':>9}{'hits':>10}{'0 hit':>7}")
+    for path, r in results.items():
+        print(f"{path:<6}{r['p50_ms']:>9.2f}{r['p90_ms']:>9.2f}{r['max_ms']:>9.2f}{r['mean_hits']:>10.0f}{r['zero_hit_queries']:>7}")
+
 @app.route('/admin/profile', methods=['GET', 'POST'])
 @login_required
 def admin_profile():
@@ -947,11 +1071,10 @@ def search_product():
     page = request.args.get('page', 1, type=int)
     per_page = 8
     query = Item.query
+    rank = None
     if keyword:
-        query = query.filter(or_(
-            Item.name.ilike(f"%{keyword}%"),
-            Item.description.ilike(f"%{keyword}%")
-        ))
+        # Tìm trên chỉ mục FTS5 (không phân biệt dấu), kết quả xếp theo BM25; chưa có chỉ mục thì dùng LIKE
+        query, rank = filter_by_keyword(query, keyword)
     if category_id:
         query = query.filter_by(category_id=category_id)
 
@@ -959,9 +1082,11 @@ def search_product():
         query = query.order_by(Item.price.asc())
     elif sort == 'price_desc':
         query = query.order_by(Item.price.desc())
+    if rank is not None:
+        query = query.order_by(rank)
     pagination = query.paginate(page=page, per_page=12)
     items = pagination.items
-    categories = Category.query.all()
+    categories = get_metadata().categories
     return render_template('user/search.html', keyword=keyword, items=items, sort=sort,
                            selected_category=category_id, categories=categories, pagination=pagination)
 
@@ -0,0 +1,149 @@
+import re
+import unicodedata
+from sqlalchemy import column, event, func, inspect, literal_column, or_, select, table, text
+from market import db
+from market.models import Item, Category, Brand, Tag
+
+SEARCH_TABLE = 'item_search'
+SEARCH_COLUMNS = ('name', 'description', 'category', 'brand', 'tags')
+# Trọng số BM25 theo thứ tự cột: khớp ở tên quan trọng hơn khớp ở mô tả
+BM25_WEIGHTS = (10.0, 1.0, 4.0, 4.0, 2.0)
+REINDEX_CHUNK_SIZE = 500
+
+# Giống migration 8b4f0c6d2a19; rowid của item_search chính là item.id
+SEARCH_TABLE_DDL = (
+    f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5({', '.join(SEARCH_COLUMNS)}, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+item_search = table(SEARCH_TABLE, column('rowid'), *(column(name) for name in SEARCH_COLUMNS))
+
+_TOKEN_RE = re.compile(r'\w+')
+
+
+def fold_text(value):
+    # Bỏ dấu tiếng Việt; "đ" là chữ riêng chứ không phải dấu nên unicode61 không tự gộp thành "d"
+    value = unicodedata.normalize('NFD', value or '').replace('đ', 'd').replace('Đ', 'D')
+    return ''.join(ch for ch in value if not unicodedata.combining(ch)).lower()
+
+
+def match_query(keyword):
+    # Mỗi từ là một truy vấn tiền tố trong ngoặc kép (không bị hiểu là cú pháp FTS5), các từ nối bằng AND
+    tokens = _TOKEN_RE.findall(fold_text(keyword))
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def ranked_item_ids(match):
+    return select(
+        item_search.c.rowid.label('item_id'),
+        func.bm25(literal_column(SEARCH_TABLE), *BM25_WEIGHTS).label('rank'),
+    ).where(literal_column(SEARCH_TABLE).op('MATCH')(match)).subquery()
+
+
+_available = None
+
+
+def search_index_available():
+    global _available
+    if _available is None:
+        _available = db.engine.dialect.name == 'sqlite' and inspect(db.engine).has_table(SEARCH_TABLE)
+    return _available
+
+
+def filter_by_keyword(query, keyword):
+    # Trả về (query, cột rank); rank là None khi phải dùng LIKE (chưa có bảng FTS hoặc từ khoá không có chữ)
+    match = match_query(keyword)
+    if match and search_index_available():
+        ranked = ranked_item_ids(match)
+        return query.join(ranked, Item.id == ranked.c.item_id), ranked.c.rank
+    return query.filter(or_(Item.name.ilike(f"%{keyword}%"), Item.description.ilike(f"%{keyword}%"))), None
+
+
+def _documents(connection, item_ids):
+    items = Item.__table__
+    rows = connection.execute(
+        select(items.c.id, items.c.name, items.c.description, Category.name, Brand.name)
+        .select_from(items.outerjoin(Category.__table__, items.c.category_id == Category.id)
+                     .outerjoin(Brand.__table__, items.c.brand_id == Brand.id))
+        .where(items.c.id.in_(item_ids))
+    ).all()
+
+    item_tag = Item.item_tag
+    tags = {}
+    for item_id, name in connection.execute(
+        select(item_tag.c.item_id, Tag.name)
+        .join(Tag.__table__, Tag.id == item_tag.c.tag_id)
+        .where(item_tag.c.item_id.in_(item_ids))
+    ):
+        tags.setdefault(item_id, []).append(name)
+
+    return [
+        {'rowid': item_id, 'name': fold_text(name), 'description': fold_text(description),
+         'category': fold_text(category), 'brand': fold_text(brand),
+         'tags': fold_text(' '.join(tags.get(item_id, [])))}
+        for item_id, name, description, category, brand in rows
+    ]
+
+
+def reindex_items(connection, item_ids):
+    item_ids = sorted(item_ids)
+    for start in range(0, len(item_ids), REINDEX_CHUNK_SIZE):
+        chunk = item_ids[start:start + REINDEX_CHUNK_SIZE]
+        connection.execute(item_search.delete().where(item_search.c.rowid.in_(chunk)))
+        documents = _documents(connection, chunk)
+        if documents:
+            connection.execute(item_search.insert(), documents)
+
+
+def create_search_table(connection):
+    connection.execute(text(SEARCH_TABLE_DDL))
+
+
+def rebuild_search_index(connection):
+    connection.execute(item_search.delete())
+    item_ids = connection.execute(select(Item.__table__.c.id)).scalars().all()
+    reindex_items(connection, item_ids)
+    connection.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('optimize')"))
+    return len(item_ids)
+
+
+# Đồng bộ chỉ mục trong cùng transaction với thay đổi ORM: rollback thì chỉ mục cũng được hoàn tác.
+# Thay đổi bằng SQL thô không đi qua các event này, khi đó chạy lại `flask rebuild_search_index`.
+_TAXONOMY_COLUMNS = {Category: Item.category_id, Brand: Item.brand_id}
+
+
+def _changed_name(obj):
+    return inspect(obj).attrs.name.history.has_changes()
+
+
+@event.listens_for(db.session, 'before_flush')
+def _collect_taxonomy_changes(session, flush_context, instances):
+    # Item gắn với category/brand/tag bị đổi tên hoặc xoá phải lấy trước khi flush, lúc item_tag còn nguyên
+    if not search_index_available():
+        return
+    pending = session.info.setdefault('search_reindex', set())
+    for obj in list(session.dirty) + list(session.deleted):
+        deleted = obj in session.deleted
+        if type(obj) in _TAXONOMY_COLUMNS and (deleted or _changed_name(obj)):
+            foreign_key = _TAXONOMY_COLUMNS[type(obj)]
+            pending.update(session.connection().execute(select(Item.id).where(foreign_key == obj.id)).scalars())
+        elif isinstance(obj, Tag) and (deleted or _changed_name(obj)):
+            item_tag = Item.item_tag
+            pending.update(session.connection().execute(
+                select(item_tag.c.item_id).where(item_tag.c.tag_id == obj.id)).scalars())
+
+
+@event.listens_for(db.session, 'after_flush')
+def _sync_search_index(session, flush_context):
+    if not search_index_available():
+        return
+    pending = session.info.pop('search_reindex', set())
+    deleted = {obj.id for obj in session.deleted if isinstance(obj, Item)}
+    pending.update(obj.id for obj in list(session.new) + list(session.dirty) if isinstance(obj, Item))
+    pending -= deleted
+
+    connection = session.connection()
+    if deleted:
+        connection.execute(item_search.delete().where(item_search.c.rowid.in_(deleted)))
+    if pending:
+        reindex_items(connection, pending)
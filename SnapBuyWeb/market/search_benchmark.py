@@ -0,0 +1,118 @@
+import os
+import random
+import shutil
+import tempfile
+import time
+import numpy as np
+from sqlalchemy import create_engine, func, or_, select
+from market import db
+from market.models import Item, Category, Brand, Tag
+from market.search import create_search_table, match_query, ranked_item_ids, rebuild_search_index
+
+INSERT_CHUNK_SIZE = 5000
+PER_PAGE = 12
+
+WORDS = (
+    'sữa', 'tươi', 'tiệt', 'trùng', 'ít', 'đường', 'hộp', 'thùng', 'điện', 'thoại', 'bàn', 'phím', 'chuột',
+    'loa', 'tai', 'nghe', 'không', 'dây', 'áo', 'thun', 'quần', 'giày', 'thể', 'thao', 'đồng', 'hồ', 'nồi',
+    'cơm', 'máy', 'giặt', 'xay', 'sinh', 'tố', 'bánh', 'kẹo', 'trà', 'xanh', 'cà', 'phê', 'dầu', 'gội',
+    'kem', 'đánh', 'răng', 'nước', 'mắm', 'gạo', 'thơm', 'chính', 'hãng', 'cao', 'cấp', 'giá', 'rẻ',
+    'khuyến', 'mãi', 'mới', 'nhỏ', 'gọn', 'bền', 'đẹp', 'chống', 'nắng', 'vitamin', 'organic', 'pro', 'mini',
+)
+
+# Có cả từ gõ không dấu: LIKE không tìm ra, FTS vẫn khớp nhờ bỏ dấu
+QUERIES = (
+    'sữa tươi', 'sua tuoi', 'điện thoại', 'dien thoai', 'bàn phím cơ', 'máy', 'đồng hồ thể thao',
+    'kem danh rang', 'nồi cơm điện', 'cà phê', 'pro', 'áo thun cao cấp',
+)
+
+
+def _sentence(rng, n_min, n_max):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(n_min, n_max)))
+
+
+def build_synthetic_db(path, n_items, seed=42):
+    # Tạo DB SQLite tạm có cùng schema item/category/brand/tag và chỉ mục FTS
+    rng = random.Random(seed)
+    engine = create_engine(f"sqlite:///{path}")
+    tables = [Category.__table__, Brand.__table__, Tag.__table__, Item.__table__, Item.item_tag]
+    db.metadata.create_all(engine, tables=tables)
+
+    with engine.begin() as connection:
+        connection.execute(Category.__table__.insert(),
+                           [{'id': i, 'name': f"Danh mục {_sentence(rng, 1, 2)} {i}"} for i in range(1, 21)])
+        connection.execute(Brand.__table__.insert(),
+                           [{'id': i, 'name': f"Thương hiệu {i}"} for i in range(1, 51)])
+        connection.execute(Tag.__table__.insert(),
+                           [{'id': i, 'name': f"{rng.choice(WORDS)} {i}"} for i in range(1, 31)])
+
+        for start in range(1, n_items + 1, INSERT_CHUNK_SIZE):
+            ids = range(start, min(start + INSERT_CHUNK_SIZE, n_items + 1))
+            connection.execute(Item.__table__.insert(), [{
+                'id': item_id,
+                'name': _sentence(rng, 3, 6),
+                'description': _sentence(rng, 15, 30),
+                'price': rng.randint(10, 5000) * 1000,
+                'category_id': rng.randint(1, 20),
+                'brand_id': rng.randint(1, 50),
+            } for item_id in ids])
+            connection.execute(Item.item_tag.insert(), [
+                {'item_id': item_id, 'tag_id': tag_id}
+                for item_id in ids for tag_id in rng.sample(range(1, 31), 2)
+            ])
+
+        create_search_table(connection)
+        rebuild_search_index(connection)
+    return engine
+
+
+def _like_page(connection, keyword):
+    # Đường cũ của search_product: quét toàn bảng, không xếp hạng
+    condition = or_(Item.name.ilike(f"%{keyword}%"), Item.description.ilike(f"%{keyword}%"))
+    total = connection.execute(select(func.count()).select_from(Item.__table__).where(condition)).scalar()
+    ids = connection.execute(select(Item.id).where(condition).limit(PER_PAGE)).scalars().all()
+    return total, ids
+
+
+def _fts_page(connection, keyword):
+    ranked = ranked_item_ids(match_query(keyword))
+    query = select(Item.id).join(ranked, Item.id == ranked.c.item_id)
+    total = connection.execute(select(func.count()).select_from(query.subquery())).scalar()
+    ids = connection.execute(query.order_by(ranked.c.rank).limit(PER_PAGE)).scalars().all()
+    return total, ids
+
+
+def _time_queries(connection, page, repeats):
+    timings, totals = [], []
+    for keyword in QUERIES:
+        for _ in range(repeats):
+            started = time.perf_counter()
+            total, _ = page(connection, keyword)
+            timings.append(time.perf_counter() - started)
+        totals.append(total)
+    timings = np.array(timings) * 1000
+    return {
+        'p50_ms': float(np.percentile(timings, 50)),
+        'p90_ms': float(np.percentile(timings, 90)),
+        'max_ms': float(timings.max()),
+        'mean_hits': float(np.mean(totals)),
+        'zero_hit_queries': sum(total == 0 for total in totals),
+    }
+
+
+def run_search_benchmark(n_items=100000, repeats=5, seed=42):
+    workdir = tempfile.mkdtemp(prefix='search_benchmark_')
+    try:
+        started = time.perf_counter()
+        engine = build_synthetic_db(os.path.join(workdir, 'search.db'), n_items, seed)
+        build_seconds = time.perf_counter() - started
+
+        with engine.connect() as connection:
+            results = {
+                'like': _time_queries(connection, _like_page, repeats),
+                'fts': _time_queries(connection, _fts_page, repeats),
+            }
+        engine.dispose()
+        return results, build_seconds
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
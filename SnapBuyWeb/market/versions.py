@@ -0,0 +1,61 @@
+import threading
+import time
+from sqlalchemy import update
+from market import db
+from market.models import CacheVersion
+
+VERSION_POLL_INTERVAL = 2.0
+
+
+def read_versions(names):
+    # Một query cho nhiều tên; tên chưa có dòng nào được coi là phiên bản 0
+    rows = dict(db.session.query(CacheVersion.name, CacheVersion.version).filter(CacheVersion.name.in_(names)).all())
+    return {name: rows.get(name) or 0 for name in names}
+
+
+def bump_versions(names):
+    for name in names:
+        result = db.session.execute(
+            update(CacheVersion).where(CacheVersion.name == name).values(version=CacheVersion.version + 1)
+        )
+        if result.rowcount == 0:
+            db.session.add(CacheVersion(name=name, version=1))
+    db.session.commit()
+
+
+class VersionStamp:
+    # Số phiên bản của một nhóm dữ liệu, lưu trong bảng cache_version để mọi worker process cùng thấy.
+    # current() chỉ đọc lại DB sau mỗi poll_interval giây; bump() tăng trong DB và cập nhật ngay process hiện tại.
+
+    def __init__(self, name, poll_interval=VERSION_POLL_INTERVAL):
+        self.name = name
+        self.poll_interval = poll_interval
+        self._state = None
+        self._lock = threading.Lock()
+
+    def _read(self):
+        return read_versions([self.name])[self.name]
+
+    def _fresh(self, state):
+        return state is not None and time.monotonic() - state[1] < self.poll_interval
+
+    def current(self):
+        state = self._state
+        if self._fresh(state):
+            return state[0]
+
+        with self._lock:
+            if self._state is state or not self._fresh(self._state):
+                self._state = (self._read(), time.monotonic())
+            return self._state[0]
+
+    def bump(self):
+        bump_versions([self.name])
+
+        with self._lock:
+            self._state = (self._read(), time.monotonic())
+            return self._state[0]
+
+
+# Tăng mỗi khi admin sửa item/danh mục: fragment trang market và chỉ mục content của mọi worker theo dõi số này
+catalog_stamp = VersionStamp('catalog')
@@ -0,0 +1,76 @@
+import time
+
+
+def _warm_catalog():
+    from model_ml.catalog import get_catalog
+    catalog = get_catalog()
+    return f"{len(catalog.item_ids)} item"
+
+
+def _warm_metadata():
+    from market.metadata import get_metadata
+    metadata = get_metadata()
+    return f"{len(metadata.categories)} category, {len(metadata.brands)} brand, {len(metadata.tags)} tag"
+
+
+def _warm_content():
+    from model_ml.content_index import get_content_index
+    index = get_content_index()
+    if index.neighbors.shape[0] != len(index.item_ids):
+        raise ValueError('Số dòng đồ thị láng giềng không khớp số item')
+    return f"{len(index.item_ids)} item, top-{index.neighbors.shape[1]}"
+
+
+def _warm_mind():
+    from model_ml.mind_recommender import MODEL_PATH, mind_model_holder
+    model = mind_model_holder.get()
+    if model is None:
+        raise FileNotFoundError(MODEL_PATH)
+    if model.profile_matrix.shape[1] != model.tfidf_matrix.shape[1]:
+        raise ValueError('Hồ sơ người dùng và ma trận TF-IDF khác số chiều')
+    return f"{len(model.item_ids)} item, {len(model.profile_user_ids)} hồ sơ"
+
+
+def _warm_ratings():
+    from model_ml.catalog import get_catalog
+    from model_ml.ratings_recommender import MODEL_PATH, ratings_model_holder
+    model = ratings_model_holder.get()
+    if model is None:
+        raise FileNotFoundError(MODEL_PATH)
+    if model.pu.shape[1] != model.qi.shape[1]:
+        raise ValueError('Vector user và item khác số chiều')
+    # Tính sẵn ánh xạ catalog -> chỉ số item của model
+    known = int((get_catalog().model_indices(model) >= 0).sum())
+    return f"{len(model.user_ids)} user, {len(model.item_ids)} item ({known} có trong catalog)"
+
+
+def _warm_popularity():
+    from model_ml.popularity import get_popularity
+    return f"{len(get_popularity().item_ids)} item"
+
+
+WARMUP_STEPS = (
+    ('catalog', _warm_catalog),
+    ('metadata', _warm_metadata),
+    ('content', _warm_content),
+    ('mind', _warm_mind),
+    ('ratings', _warm_ratings),
+    ('popularity', _warm_popularity),
+)
+
+
+def warm_up(app):
+    # Nạp và kiểm tra mọi artifact gợi ý trước khi nhận request; bước lỗi được ghi log, các bước khác vẫn chạy
+    results = []
+    with app.app_context():
+        for name, step in WARMUP_STEPS:
+            started = time.perf_counter()
+            try:
+                detail, ok = step(), True
+            except Exception as exc:
+                app.logger.exception('Warm-up %s thất bại', name)
+                detail, ok = f"{type(exc).__name__}: {exc}", False
+            elapsed = time.perf_counter() - started
+            print(f"[warm-up] {name}: {'OK' if ok else 'LỖI'} {elapsed:.2f}s - {detail}")
+            results.append((name, ok, elapsed, detail))
+    return results
@@ -0,0 +1,52 @@
+"""Add item_search FTS5 table
+
+Revision ID: 8b4f0c6d2a19
+Revises: 5d2e8a41c7b3
+Create Date: 2025-09-08 16:05:51.914276
+
+"""
+import unicodedata
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b4f0c6d2a19'
+down_revision = '5d2e8a41c7b3'
+branch_labels = None
+depends_on = None
+
+
+def _fold(value):
+    value = unicodedata.normalize('NFD', value or '').replace('đ', 'd').replace('Đ', 'D')
+    return ''.join(ch for ch in value if not unicodedata.combining(ch)).lower()
+
+
+def upgrade():
+    op.execute(
+        "CREATE VIRTUAL TABLE item_search USING fts5("
+        "name, description, category, brand, tags, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+
+    # Nạp chỉ mục cho các item đã có; rowid của item_search chính là item.id
+    bind = op.get_bind()
+    rows = bind.execute(sa.text(
+        "SELECT item.id, item.name, item.description, category.name, brand.name, "
+        "(SELECT group_concat(tag.name, ' ') FROM item_tag JOIN tag ON tag.id = item_tag.tag_id "
+        " WHERE item_tag.item_id = item.id) "
+        "FROM item LEFT JOIN category ON category.id = item.category_id "
+        "LEFT JOIN brand ON brand.id = item.brand_id"
+    )).all()
+    if rows:
+        bind.execute(
+            sa.text("INSERT INTO item_search(rowid, name, description, category, brand, tags) "
+                    "VALUES (:rowid, :name, :description, :category, :brand, :tags)"),
+            [{'rowid': item_id, 'name': _fold(name), 'description': _fold(description),
+              'category': _fold(category), 'brand': _fold(brand), 'tags': _fold(tags)}
+             for item_id, name, description, category, brand, tags in rows]
+        )
+
+
+def downgrade():
+    op.execute("DROP TABLE item_search")
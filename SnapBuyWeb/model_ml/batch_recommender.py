@@ -0,0 +1,155 @@
+import datetime
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from market import db
+from market.models import Order, User, UserRecommendation
+from model_ml import ratings_recommender
+from model_ml.catalog import CatalogSnapshot, get_catalog
+from model_ml.content_index import ContentIndex, get_content_index
+from model_ml.mind_recommender import MindModel, mind_model_holder
+from model_ml.models.ranking import top_n_per_row
+
+RECOMMENDERS = ('content', 'mind', 'ratings')
+DEFAULT_TOP_N = 10
+DEFAULT_BLOCK_SIZE = 256
+
+# Model của từng worker, được dựng 1 lần trong initializer của process pool
+_worker_models = {}
+
+
+def _content_payload():
+    index = get_content_index()
+    return {'item_ids': index.item_ids, 'neighbors': index.neighbors, 'scores': index.scores}
+
+
+def _mind_payload():
+    mind_model = mind_model_holder.get()
+    if mind_model is None:
+        return None
+    return {
+        'tfidf_matrix': mind_model.tfidf_matrix,
+        'item_ids': mind_model.item_ids,
+        'profile_matrix': mind_model.profile_matrix,
+        'profile_user_ids': mind_model.profile_user_ids,
+        'profile_counts': mind_model.user_counts,
+    }
+
+
+def _ratings_payload():
+    if not os.path.exists(ratings_recommender.MODEL_PATH):
+        return None
+    return {'model_path': ratings_recommender.MODEL_PATH, 'item_ids': get_catalog().item_ids}
+
+
+_PAYLOADS = {
+    'content': _content_payload,
+    'mind': _mind_payload,
+    'ratings': _ratings_payload,
+}
+
+_LOADERS = {
+    'content': lambda payload: ContentIndex(payload['item_ids'], payload['neighbors'], payload['scores']),
+    'mind': lambda payload: MindModel(payload),
+    'ratings': lambda payload: {'model': ratings_recommender.load_factor_model(payload['model_path']),
+                                'catalog': CatalogSnapshot(payload['item_ids'])},
+}
+
+
+def _init_worker(payloads):
+    for kind, payload in payloads.items():
+        _worker_models[kind] = _LOADERS[kind](payload)
+
+
+def _score_content(index, block, top_n):
+    results = []
+    for user_id, purchased_item_ids in block:
+        item_ids, scores = index.recommend(purchased_item_ids, top_n=top_n, exclude_ids=purchased_item_ids)
+        results.append((user_id, list(zip(item_ids.tolist(), scores.tolist()))))
+    return results
+
+
+def _score_mind(mind_model, block, top_n):
+    user_ids = [user_id for user_id, _ in block]
+    rows = mind_model.profile_rows(user_ids)
+    known = rows >= 0
+    if not known.any():
+        return []
+
+    top_indices, top_scores = top_n_per_row(mind_model.score_users(rows[known]), top_n)
+    known_user_ids = [user_id for user_id, is_known in zip(user_ids, known) if is_known]
+    return [
+        (user_id, list(zip(mind_model.item_ids[indices].tolist(), scores.tolist())))
+        for user_id, indices, scores in zip(known_user_ids, top_indices, top_scores)
+    ]
+
+
+def _score_ratings(state, block, top_n):
+    model, catalog = state['model'], state['catalog']
+    item_ids = catalog.item_ids
+
+    # User chưa có trong model không được ghi dòng nào, trang chủ sẽ trả bảng xếp hạng phổ biến
+    block = [(user_id, purchased) for user_id, purchased in block if model.user_index(user_id) >= 0]
+    if not block:
+        return []
+
+    user_rows = [model.user_index(user_id) for user_id, _ in block]
+    scores = model.score_users(user_rows, catalog.model_factors(model))
+    for row, (_, purchased_item_ids) in enumerate(block):
+        if purchased_item_ids:
+            scores[row, np.isin(item_ids, purchased_item_ids)] = -np.inf
+
+    top_indices, top_scores = top_n_per_row(scores, top_n)
+    return [
+        (user_id, [(item_id, score) for item_id, score in zip(item_ids[indices].tolist(), row_scores.tolist())
+                   if np.isfinite(score)])
+        for (user_id, _), indices, row_scores in zip(block, top_indices, top_scores)
+    ]
+
+
+_SCORERS = {
+    'content': _score_content,
+    'mind': _score_mind,
+    'ratings': _score_ratings,
+}
+
+
+def _score_block(kind, block, top_n):
+    return _SCORERS[kind](_worker_models[kind], block, top_n)
+
+
+def precompute_recommendations(kinds=RECOMMENDERS, top_n=DEFAULT_TOP_N, block_size=DEFAULT_BLOCK_SIZE, workers=None):
+    purchased = {}
+    for user_id, item_id in db.session.query(Order.user_id, Order.item_id):
+        purchased.setdefault(user_id, set()).add(item_id)
+    users = [(user_id, tuple(purchased.get(user_id, ()))) for (user_id,) in db.session.query(User.id).order_by(User.id)]
+    blocks = [users[start:start + block_size] for start in range(0, len(users), block_size)]
+
+    payloads = {}
+    for kind in kinds:
+        payload = _PAYLOADS[kind]()
+        if payload is not None:
+            payloads[kind] = payload
+
+    summary = {}
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(payloads,)) as executor:
+        for kind in payloads:
+            now = datetime.datetime.utcnow()
+            # Xoá bảng cũ và ghi bảng mới trong cùng một transaction, ghi dần theo từng block đã tính xong
+            UserRecommendation.query.filter_by(recommender=kind).delete(synchronize_session=False)
+            n_users = 0
+            results = executor.map(_score_block, [kind] * len(blocks), blocks, [top_n] * len(blocks))
+            for block_results in results:
+                rows = [
+                    {'user_id': user_id, 'recommender': kind, 'rank': rank, 'item_id': int(item_id),
+                     'score': float(score), 'created_at': now}
+                    for user_id, ranked in block_results
+                    for rank, (item_id, score) in enumerate(ranked)
+                ]
+                if rows:
+                    db.session.execute(UserRecommendation.__table__.insert(), rows)
+                n_users += sum(1 for _, ranked in block_results if ranked)
+            db.session.commit()
+            summary[kind] = n_users
+
+    return summary
@@ -0,0 +1,88 @@
+import time
+import tracemalloc
+from types import SimpleNamespace
+import numpy as np
+from market import db
+from market.models import Order
+from model_ml.models.metrics import ranking_metrics
+
+DEFAULT_K = 5
+DEFAULT_TEST_RATIO = 0.2
+LATENCY_PERCENTILES = (50, 90, 99)
+
+
+def _recommenders(cutoff=None):
+    from model_ml.content_recommender import get_content_recommendations
+    from model_ml.mind_recommender import get_mind_recommendations
+    from model_ml.ratings_recommender import get_ratings_recommendations
+    return {
+        'content': get_content_recommendations,
+        # Hồ sơ MIND đọc từ user_history: chỉ lấy lượt xem trước mốc cắt, giống các đơn hàng của user giả
+        'mind': lambda user, top_n: get_mind_recommendations(user, top_n=top_n, before=cutoff),
+        'ratings': get_ratings_recommendations,
+    }
+
+
+def time_split(test_ratio=DEFAULT_TEST_RATIO):
+    # Chia đơn hàng theo thời gian: test_ratio đơn mới nhất làm tập test, phần còn lại là lịch sử của user.
+    # User giả (SimpleNamespace) chỉ mang các đơn trước mốc cắt nên recommender không "nhìn thấy" tập test.
+    rows = db.session.query(Order.user_id, Order.item_id, Order.created_at).order_by(Order.created_at, Order.id).all()
+    n_test = int(round(len(rows) * test_ratio))
+    history, held_out = rows[:len(rows) - n_test], rows[len(rows) - n_test:]
+
+    orders = {}
+    for user_id, item_id, _ in history:
+        orders.setdefault(user_id, []).append(SimpleNamespace(item_id=item_id))
+
+    truth = {}
+    for user_id, item_id, _ in held_out:
+        truth.setdefault(user_id, set()).add(item_id)
+
+    users = [SimpleNamespace(id=user_id, orders=orders.get(user_id, [])) for user_id in sorted(truth)]
+    cutoff = held_out[0][2] if held_out else None
+    return users, truth, cutoff
+
+
+def benchmark_recommender(recommend, users, truth, k=DEFAULT_K, memory_users=None):
+    recommended = np.full((len(users), k), -1, dtype=np.int64)
+    latencies = np.empty(len(users))
+    for row, user in enumerate(users):
+        start = time.perf_counter()
+        items = recommend(user, top_n=k)
+        latencies[row] = time.perf_counter() - start
+        item_ids = [item.id for item in items][:k]
+        recommended[row, :len(item_ids)] = item_ids
+
+    # Đo bộ nhớ ở lượt riêng vì tracemalloc làm chậm đáng kể từng lời gọi
+    tracemalloc.start()
+    for user in users[:memory_users]:
+        recommend(user, top_n=k)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    truth_rows = np.repeat(np.arange(len(users)), [len(truth[user.id]) for user in users])
+    truth_items = np.fromiter((item_id for user in users for item_id in truth[user.id]), dtype=np.int64,
+                              count=len(truth_rows))
+    result = ranking_metrics(recommended, truth_rows, truth_items)
+    result['coverage'] = float(np.mean((recommended >= 0).any(axis=1)))
+    for p, value in zip(LATENCY_PERCENTILES, np.percentile(latencies * 1000, LATENCY_PERCENTILES)):
+        result[f'p{p}_ms'] = float(value)
+    result['peak_mem_kb'] = peak / 1024
+    return result
+
+
+def run_benchmark(kinds=None, k=DEFAULT_K, test_ratio=DEFAULT_TEST_RATIO, max_users=None, memory_users=50):
+    users, truth, cutoff = time_split(test_ratio)
+    users = users[:max_users]
+    recommenders = _recommenders(cutoff)
+
+    # Gọi 1 lần trước để việc load model/chỉ mục không bị tính vào độ trễ
+    for kind in kinds or recommenders:
+        if users:
+            recommenders[kind](users[0], top_n=k)
+
+    results = {
+        kind: benchmark_recommender(recommenders[kind], users, truth, k=k, memory_users=memory_users)
+        for kind in kinds or recommenders
+    }
+    return results, len(users), cutoff
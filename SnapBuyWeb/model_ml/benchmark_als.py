@@ -0,0 +1,40 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from surprise import SVD, Dataset, Reader
+from models.als_model import fit_als, rmse
+from models.factor_model import FactorModel
+
+
+def main():
+    df = pd.read_csv('model_ml/data/ratings.csv')
+    test = df.sample(frac=0.2, random_state=42)
+    train = df.drop(test.index)
+    rating_scale = (df['rating'].min(), df['rating'].max())
+    print(f"Train: {len(train)} rating, test: {len(test)} rating")
+
+    reader = Reader(rating_scale=rating_scale)
+    trainset = Dataset.load_from_df(train[['userId', 'movieId', 'rating']], reader).build_full_trainset()
+    start = time.perf_counter()
+    svd = SVD(random_state=42)
+    svd.fit(trainset)
+    svd_time = time.perf_counter() - start
+    svd_rmse = rmse(FactorModel.from_surprise(svd), test['userId'], test['movieId'], test['rating'])
+    print(f"Surprise SVD        | fit {svd_time:6.2f}s | RMSE {svd_rmse:.4f}")
+
+    for workers in sorted({1, 2, os.cpu_count() or 1}):
+        start = time.perf_counter()
+        model = fit_als(train['userId'], train['movieId'], train['rating'], workers=workers, rating_scale=rating_scale)
+        als_time = time.perf_counter() - start
+        als_rmse = rmse(model, test['userId'], test['movieId'], test['rating'])
+        print(f"ALS ({workers} worker)      | fit {als_time:6.2f}s | RMSE {als_rmse:.4f}")
+
+    baseline = np.full(len(test), train['rating'].mean())
+    print(f"Trung bình toàn cục | RMSE {np.sqrt(np.mean((test['rating'].to_numpy() - baseline) ** 2)):.4f}")
+
+
+# fit_als dùng ProcessPoolExecutor: process con import lại file này nên phần chạy phải nằm sau guard
+if __name__ == "__main__":
+    # Chạy từ thư mục SnapBuyWeb: python model_ml/benchmark_als.py
+    main()
@@ -0,0 +1,61 @@
+import threading
+import time
+import numpy as np
+from market import db
+from market.models import Item
+
+# Thêm/xoá item qua route sẽ làm mới ngay; MAX_AGE là lưới an toàn cho item thêm ngoài app (seed, import)
+MAX_AGE = 300.0
+
+
+class CatalogSnapshot:
+    # Mảng id item (tăng dần) của catalog kèm ánh xạ sang chỉ số của model và qi/bi đã lấy sẵn, cache theo từng model
+
+    def __init__(self, item_ids):
+        self.item_ids = np.asarray(sorted(item_ids), dtype=np.int64)
+        self.built_at = time.monotonic()
+        self._indexed_model = None
+        self._model_indices = None
+        self._model_factors = None
+        self._lock = threading.Lock()
+
+    def _index_model(self, model):
+        # Model được hot reload là object mới nên ánh xạ sẽ được tính lại đúng 1 lần
+        with self._lock:
+            if self._indexed_model is not model:
+                indices = model.item_indices(self.item_ids)
+                self._model_indices, self._model_factors = indices, model.item_factors(indices)
+                self._indexed_model = model
+            return self._model_indices, self._model_factors
+
+    def model_indices(self, model):
+        return self._index_model(model)[0]
+
+    def model_factors(self, model):
+        # Request chỉ còn phép nhân pu . qi, không phải gather qi/bi của cả catalog mỗi lần
+        return self._index_model(model)[1]
+
+    @classmethod
+    def load(cls):
+        return cls(item_id for (item_id,) in db.session.query(Item.id))
+
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+
+
+def get_catalog():
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is not None and time.monotonic() - snapshot.built_at < MAX_AGE:
+        return snapshot
+
+    with _snapshot_lock:
+        if _snapshot is snapshot:
+            _snapshot = CatalogSnapshot.load()
+        return _snapshot
+
+
+def invalidate_catalog():
+    global _snapshot
+    _snapshot = None
@@ -0,0 +1,298 @@
+import os
+import pickle
+import threading
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+from flask import current_app
+from market import db
+from market.catalog_changes import changes_since, latest_change_id
+from market.models import Item, Category
+from market.versions import catalog_stamp
+from model_ml.models.neighbor_graph import DEFAULT_TOP_K, build_neighbor_graph, select_top_k
+from model_ml.models.ranking import top_n_indices
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DATA_PATH = os.path.join(BASE_DIR, 'model_ml', 'data', 'items_content.csv')
+MODEL_PATH = os.path.join(BASE_DIR, 'model_ml', 'model_content_based.pkl')
+
+# Thiếu quá tỉ lệ này so với catalog trong DB thì build lại cả đồ thị thay vì thêm từng item
+REBUILD_RATIO = 0.2
+
+# Chỉ mục đang phục vụ không bao giờ bị sửa tại chỗ: mọi thay đổi tạo bản mới rồi mới gán lại _index
+_index = None
+_synced_version = None
+# id cuối cùng của nhật ký catalog_change đã áp dụng vào _index
+_synced_change_id = 0
+_lock = threading.Lock()
+_syncing = False
+
+
+def item_text(name, description, category):
+    return f"{name or ''} {description or ''} {category or ''}"
+
+
+def catalog_texts(item_ids=None):
+    query = db.session.query(Item.id, Item.name, Item.description, Category.name) \
+        .outerjoin(Category, Item.category_id == Category.id)
+    if item_ids is not None:
+        query = query.filter(Item.id.in_(item_ids))
+    rows = query.all()
+    return {item_id: item_text(name, description, category) for item_id, name, description, category in rows}
+
+
+class ContentIndex:
+    def __init__(self, item_ids, neighbors, scores, matrix=None, vectorizer=None):
+        self.item_ids = np.asarray(item_ids, dtype=np.int64)
+        self.neighbors = neighbors
+        self.scores = scores
+        self.matrix = None if matrix is None else normalize(matrix).astype(np.float32).tocsr()
+        self.vectorizer = vectorizer
+        self.active = np.ones(len(self.item_ids), dtype=bool)
+        self.id_to_index = {int(item_id): idx for idx, item_id in enumerate(self.item_ids)}
+        # Văn bản đã dùng để vector hóa từng item, để lần đồng bộ sau nhận ra item bị sửa
+        self.texts = {}
+
+    def __len__(self):
+        return len(self.item_ids)
+
+    def similar(self, item_id, top_n=5):
+        idx = self.id_to_index.get(item_id)
+        if idx is None:
+            return []
+        neighbors = self.neighbors[idx, :top_n]
+        scores = self.scores[idx, :top_n]
+        valid = neighbors >= 0
+        return list(zip(self.item_ids[neighbors[valid]].tolist(), scores[valid].tolist()))
+
+    def rows_for(self, item_ids):
+        return np.array([self.id_to_index[i] for i in item_ids if i in self.id_to_index], dtype=np.int64)
+
+    def recommend(self, seed_ids, top_n=5, exclude_ids=()):
+        # Gộp láng giềng của tất cả item hạt giống một lần: lấy max điểm theo từng ứng viên,
+        # loại các item bị loại trừ rồi chọn top_n bằng argpartition
+        seed_rows = self.rows_for(seed_ids)
+        if not seed_rows.size:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        candidates = self.neighbors[seed_rows].ravel()
+        scores = self.scores[seed_rows].ravel()
+        valid = candidates >= 0
+        exclude_rows = self.rows_for(exclude_ids)
+        if exclude_rows.size:
+            valid &= ~np.isin(candidates, exclude_rows)
+        candidates, scores = candidates[valid], scores[valid]
+
+        order = np.lexsort((-scores, candidates))
+        candidates, scores = candidates[order], scores[order]
+        first = np.ones(candidates.shape[0], dtype=bool)
+        first[1:] = candidates[1:] != candidates[:-1]
+        candidates, scores = candidates[first], scores[first]
+
+        top = top_n_indices(scores, top_n)
+        return self.item_ids[candidates[top]], scores[top]
+
+    def _top_k(self, sims, idx):
+        sims = np.where(self.active, sims, -np.inf)[None, :]
+        neighbors, scores = select_top_k(sims, self.neighbors.shape[1], offset=idx)
+        missing = ~np.isfinite(scores)
+        neighbors[missing] = -1
+        scores[missing] = 0
+        return neighbors[0], scores[0]
+
+    def _similarities(self, idx):
+        return np.asarray((self.matrix @ self.matrix[idx].T).todense()).ravel()
+
+    def _recompute_row(self, row):
+        self.neighbors[row], self.scores[row] = self._top_k(self._similarities(row), row)
+
+    def _insert_neighbor(self, row, idx, score):
+        neighbors, scores = self.neighbors[row], self.scores[row]
+        n_valid = int((neighbors >= 0).sum())
+        pos = int(np.searchsorted(-scores[:n_valid], -score, side='right'))
+        neighbors[pos + 1:] = neighbors[pos:-1].copy()
+        scores[pos + 1:] = scores[pos:-1].copy()
+        neighbors[pos], scores[pos] = idx, score
+
+    def _refresh_neighbors(self, idx):
+        if not self.neighbors.shape[1]:
+            return
+        sims = self._similarities(idx)
+        sims[~self.active] = -np.inf
+        self.neighbors[idx], self.scores[idx] = self._top_k(sims, idx)
+
+        # Các item đang trỏ tới idx: tính lại chính xác vì độ tương đồng có thể đã giảm
+        stale = np.flatnonzero((self.neighbors == idx).any(axis=1))
+        stale = stale[stale != idx]
+        for row in stale:
+            self._recompute_row(row)
+
+        # Các item mà idx giờ tốt hơn láng giềng yếu nhất: chèn idx vào đúng vị trí
+        worst = np.where(self.neighbors[:, -1] >= 0, self.scores[:, -1], -np.inf)
+        better = np.flatnonzero(sims > worst)
+        better = better[(better != idx) & ~np.isin(better, stale)]
+        for row in better:
+            self._insert_neighbor(row, idx, sims[row])
+
+    def copy(self):
+        # Các mảng bị vá tại chỗ được sao chép; matrix/item_ids chỉ bị thay bằng mảng mới nên dùng chung được
+        index = ContentIndex.__new__(ContentIndex)
+        index.__dict__.update(self.__dict__)
+        index.neighbors = self.neighbors.copy()
+        index.scores = self.scores.copy()
+        index.active = self.active.copy()
+        index.id_to_index = dict(self.id_to_index)
+        index.texts = dict(self.texts)
+        return index
+
+    def _upsert(self, item_id, text):
+        # Fold-in: vector hóa item mới/sửa bằng vocabulary + IDF sẵn có, chỉ vá láng giềng liên quan
+        vector = normalize(self.vectorizer.transform([text])).astype(np.float32).tocsr()
+        idx = self.id_to_index.get(item_id)
+        if idx is None:
+            idx = len(self.item_ids)
+            k = self.neighbors.shape[1]
+            self.matrix = sp.vstack([self.matrix, vector], format='csr')
+            self.neighbors = np.vstack([self.neighbors, np.full((1, k), -1, dtype=self.neighbors.dtype)])
+            self.scores = np.vstack([self.scores, np.zeros((1, k), dtype=self.scores.dtype)])
+            self.active = np.append(self.active, True)
+            self.item_ids = np.append(self.item_ids, item_id)
+            self.id_to_index[item_id] = idx
+        else:
+            self.matrix = sp.vstack([self.matrix[:idx], vector, self.matrix[idx + 1:]], format='csr')
+            self.active[idx] = True
+        self._refresh_neighbors(idx)
+        self.texts[item_id] = text
+
+    def _remove(self, item_id):
+        idx = self.id_to_index.pop(item_id, None)
+        self.texts.pop(item_id, None)
+        if idx is None:
+            return
+        self.active[idx] = False
+        self.neighbors[idx] = -1
+        self.scores[idx] = 0
+        for row in np.flatnonzero((self.neighbors == idx).any(axis=1)):
+            self._recompute_row(row)
+
+    def needs_rebuild(self, n_changes):
+        return self.vectorizer is None or n_changes > REBUILD_RATIO * max(len(self.id_to_index), 1)
+
+    def apply_changes(self, texts, removed_ids=()):
+        # Trả về bản mới đã thêm/sửa các item trong texts và bỏ các item trong removed_ids; bản hiện tại giữ nguyên
+        index = self.copy()
+        for item_id in removed_ids:
+            index._remove(item_id)
+        for item_id, text in texts.items():
+            if index.texts.get(item_id) != text or item_id not in index.id_to_index:
+                index._upsert(item_id, text)
+        return index
+
+    def sync_catalog(self, texts):
+        # Đồng bộ với toàn bộ danh sách item trong DB (chỉ dùng lúc load); lệch quá nhiều thì build lại.
+        # Item chưa biết văn bản (artifact cũ) được lấy làm mốc, không vector hóa lại.
+        missing = {item_id: text for item_id, text in texts.items() if item_id not in self.id_to_index}
+        changed = {item_id: text for item_id, text in texts.items()
+                   if item_id in self.texts and item_id in self.id_to_index and self.texts[item_id] != text}
+        if self.needs_rebuild(len(missing) + len(changed)):
+            return ContentIndex.from_texts(list(texts), list(texts.values()), top_k=self.neighbors.shape[1] or DEFAULT_TOP_K)
+
+        removed = [item_id for item_id in self.id_to_index if item_id not in texts]
+        index = self.apply_changes({**missing, **changed}, removed)
+        index.texts.update(texts)
+        return index
+
+    @classmethod
+    def from_texts(cls, item_ids, texts, top_k=DEFAULT_TOP_K):
+        tfidf = TfidfVectorizer(stop_words='english')
+        tfidf_matrix = tfidf.fit_transform(texts)
+        neighbors, scores = build_neighbor_graph(tfidf_matrix, top_k=top_k)
+        index = cls(item_ids, neighbors, scores, matrix=tfidf_matrix, vectorizer=tfidf)
+        index.texts = dict(zip(index.id_to_index, texts))
+        return index
+
+    @classmethod
+    def from_csv(cls, path=DATA_PATH, top_k=DEFAULT_TOP_K):
+        df = pd.read_csv(path)
+        df['combined'] = (
+            df['name'].fillna('') + ' ' +
+            df['description'].fillna('') + ' ' +
+            df['category'].fillna('')
+        )
+        return cls.from_texts(df['id'].astype(int).tolist(), df['combined'], top_k=top_k)
+
+    @classmethod
+    def from_model_data(cls, model_data):
+        return cls(model_data['item_ids'], model_data['neighbors'], model_data['scores'],
+                   matrix=model_data['tfidf_matrix'], vectorizer=model_data['vectorizer'])
+
+    @classmethod
+    def load(cls, model_path=MODEL_PATH, data_path=DATA_PATH):
+        if os.path.exists(model_path):
+            with open(model_path, 'rb') as f:
+                model_data = pickle.load(f)
+            # Artifact bản cũ (ma trận cosine đầy đủ, không có vectorizer) không fold-in được, build lại từ CSV
+            if 'vectorizer' in model_data:
+                return cls.from_model_data(model_data)
+        return cls.from_csv(data_path)
+
+def _load_index():
+    # Lấy mốc nhật ký trước khi đọc catalog: thay đổi xen giữa sẽ được áp dụng lại ở lần đồng bộ sau (không hại gì)
+    change_id = latest_change_id()
+    return ContentIndex.load().sync_catalog(catalog_texts()), change_id
+
+
+def _sync_in_background(app, version):
+    # Chỉ đọc lại văn bản của các item có trong nhật ký từ lần đồng bộ trước: O(số thay đổi), không quét cả catalog.
+    # Nhật ký đã bị dọn hoặc đổi quá nhiều thì build lại toàn bộ; cả hai đều dựng bản mới rồi đổi tham chiếu một lần
+    global _index, _synced_version, _synced_change_id, _syncing
+    try:
+        with app.app_context():
+            changes = changes_since(_synced_change_id)
+            if changes is None or _index.needs_rebuild(len(changes[1])):
+                index, change_id = _load_index()
+            else:
+                change_id, item_ids = changes
+                index = _index
+                if item_ids:
+                    texts = catalog_texts(item_ids)
+                    index = index.apply_changes(texts, item_ids - texts.keys())
+        with _lock:
+            _index, _synced_version, _synced_change_id = index, version, change_id
+    except Exception:
+        app.logger.exception('Không thể đồng bộ chỉ mục gợi ý nội dung')
+    finally:
+        _syncing = False
+
+
+def get_content_index():
+    # Mọi worker thấy phiên bản catalog đổi (đọc lại DB tối đa mỗi VERSION_POLL_INTERVAL giây) thì đồng bộ theo
+    # nhật ký catalog_change ở một thread riêng; request không chờ mà dùng tiếp bản đang có cho tới khi đổi xong
+    global _index, _synced_version, _synced_change_id, _syncing
+    version = catalog_stamp.current()
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index, _synced_change_id = _load_index()
+                _synced_version = version
+    elif _synced_version != version:
+        with _lock:
+            start = not _syncing and _synced_version != version
+            if start:
+                _syncing = True
+        if start:
+            app = current_app._get_current_object()
+            threading.Thread(target=_sync_in_background, args=(app, version), daemon=True,
+                             name='content-index-sync').start()
+    return _index
+
+
+def refresh_content_index():
+    global _index, _synced_version, _synced_change_id
+    version = catalog_stamp.current()
+    index, change_id = _load_index()
+    with _lock:
+        _index, _synced_version, _synced_change_id = index, version, change_id
+    return index
@@ -0,0 +1,16 @@
+from sqlalchemy.orm import joinedload
+from market.models import Item
+
+def hydrate_items(item_ids):
+    # Lấy toàn bộ item trong 1 câu IN, giữ nguyên thứ tự điểm và bỏ các id không còn tồn tại
+    item_ids = list(dict.fromkeys(int(item_id) for item_id in item_ids))
+    if not item_ids:
+        return []
+
+    items = Item.query.options(
+        joinedload(Item.category),
+        joinedload(Item.brand)
+    ).filter(Item.id.in_(item_ids)).all()
+
+    items_by_id = {item.id: item for item in items}
+    return [items_by_id[item_id] for item_id in item_ids if item_id in items_by_id]
@@ -1,31 +1,175 @@
 import os
-import pickle
+import threading
 import numpy as np
-from sklearn.metrics.pairwise import linear_kernel
-from market.models import Item
+import scipy.sparse as sp
+from market import db
+from market.cache import TTLCache
+from market.models import UserHistory
+from model_ml.hydration import hydrate_items
+from model_ml.model_store import ModelHolder, load_pickle
+from model_ml.models.ann_index import IVFIndex
+from model_ml.models.interactions import interaction_weight
+from model_ml.popularity import get_popular_item_ids
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 MODEL_PATH = os.path.join(BASE_DIR, 'model_ml', 'model_content_mind.pkl')
 
-def get_mind_recommendations(user, top_n=5):
-    if not os.path.exists(MODEL_PATH):
-        return []
+# Số cụm IVF được quét mỗi truy vấn: tăng để recall cao hơn, giảm để nhanh hơn (None = giá trị lúc train)
+ANN_N_PROBE = None
 
-    with open(MODEL_PATH, 'rb') as f:
-        mind_model = pickle.load(f)
+PROFILE_CACHE_SIZE = 10000
+PROFILE_CACHE_TTL = 300.0
+# Số tương tác gần nhất đọc khi dựng hồ sơ lúc cache miss; các lượt xem sau đó được cộng dồn vào hồ sơ trong cache
+PROFILE_HISTORY_LIMIT = 500
 
-    user_id = user.id
 
-    tfidf_matrix = mind_model['tfidf_matrix']
-    user_profiles = mind_model['user_profiles']
-    item_ids = mind_model['item_ids']
+def load_user_history(user_id, limit=PROFILE_HISTORY_LIMIT, before=None):
+    query = db.session.query(UserHistory.item_id, UserHistory.interaction_type) \
+        .filter(UserHistory.user_id == user_id)
+    if before is not None:
+        query = query.filter(UserHistory.timestamp < before)
+    return query.order_by(UserHistory.timestamp.desc()).limit(limit).all()
 
-    if user_id not in user_profiles:
-        return []
 
-    user_vector = np.asarray(user_profiles[user_id])
-    cosine_sim = linear_kernel(user_vector, tfidf_matrix).flatten()
-    top_indices = cosine_sim.argsort()[-top_n:][::-1]
-    recommended_item_ids = [item_ids[idx] for idx in top_indices]
+class MindModel:
+    def __init__(self, model_data):
+        self.tfidf_matrix = model_data['tfidf_matrix']
+        self.item_ids = np.asarray(model_data['item_ids'])
+        self.item_id_to_index = {item_id: idx for idx, item_id in enumerate(self.item_ids.tolist())}
+        if 'profile_matrix' in model_data:
+            profile_user_ids = np.asarray(model_data['profile_user_ids'])
+            profile_matrix = sp.csr_matrix(model_data['profile_matrix'], dtype=np.float32)
+            user_counts = np.asarray(model_data['profile_counts'])
+        else:
+            # Artifact cũ: dict user_id -> vector dense, không có số lượt xem thì coi như 1 lượt
+            legacy_profiles = model_data['user_profiles']
+            legacy_counts = model_data.get('user_counts', {})
+            profile_user_ids = np.asarray(list(legacy_profiles), dtype=np.int64)
+            profile_matrix = sp.csr_matrix(np.vstack([np.asarray(v) for v in legacy_profiles.values()])
+                                           if legacy_profiles else (0, self.tfidf_matrix.shape[1]), dtype=np.float32)
+            user_counts = np.asarray([legacy_counts.get(u, 1) for u in profile_user_ids.tolist()])
 
-    return [Item.query.get(item_id) for item_id in recommended_item_ids]
+        # Hồ sơ người dùng là một ma trận thưa (users x vocab); user_id -> dòng tra bằng searchsorted
+        order = np.argsort(profile_user_ids, kind='stable')
+        self.profile_user_ids = profile_user_ids[order]
+        self.profile_matrix = profile_matrix[order]
+        self.user_counts = user_counts[order]
+
+        # Hồ sơ dựng lại từ user_history (bảng lưu mọi lượt xem) nên giống nhau ở mọi worker và không mất khi restart;
+        # cache có giới hạn, hết hạn sau PROFILE_CACHE_TTL giây: user_id -> (tổng vector có trọng số, tổng trọng số),
+        # None nếu chưa có. Giữ tổng thay vì trung bình để lượt xem mới chỉ cần cộng thêm một vector
+        self._profiles = TTLCache(maxsize=PROFILE_CACHE_SIZE, ttl=PROFILE_CACHE_TTL)
+        self._fold_lock = threading.Lock()
+
+        if model_data.get('ann_index'):
+            self.ann_index = IVFIndex.from_state(model_data['ann_index'], self.tfidf_matrix)
+        else:
+            self.ann_index = IVFIndex.exact(self.tfidf_matrix)
+
+    @classmethod
+    def load(cls, path):
+        # items_df và vectorizer không cần khi phục vụ nên không giữ lại
+        return cls(load_pickle(path))
+
+    def profile_rows(self, user_ids):
+        user_ids = np.asarray(user_ids)
+        rows = np.searchsorted(self.profile_user_ids, user_ids)
+        rows = np.minimum(rows, max(len(self.profile_user_ids) - 1, 0))
+        found = self.profile_user_ids[rows] == user_ids if len(self.profile_user_ids) else np.zeros(len(user_ids), bool)
+        return np.where(found, rows, -1)
+
+    def score_users(self, rows):
+        # Tính điểm cho nhiều user cùng lúc bằng một phép nhân ma trận (len(rows) x n_items)
+        return (self.profile_matrix[rows] @ self.tfidf_matrix.T).toarray()
+
+    def history_profile(self, history):
+        # Giống lúc train: tổng có trọng số vector các item user đã tương tác và tổng trọng số
+        rows, weights = [], []
+        for item_id, interaction_type in history:
+            idx = self.item_id_to_index.get(item_id)
+            if idx is not None:
+                rows.append(idx)
+                weights.append(interaction_weight(interaction_type))
+        if not rows:
+            return None
+        weights = np.asarray(weights, dtype=np.float32)
+        return sp.csr_matrix(weights[None, :] @ self.tfidf_matrix[rows], dtype=np.float32), float(weights.sum())
+
+    def _load_profile(self, user_id):
+        profile = self.history_profile(load_user_history(user_id))
+        if profile is not None:
+            return profile
+        # Chưa có lịch sử trong DB: dùng hồ sơ lúc train (trung bình) nhân lại số lượt để ra tổng
+        row = self.profile_rows([user_id])[0]
+        if row < 0:
+            return None
+        count = max(float(self.user_counts[row]), 1.0)
+        return self.profile_matrix[row] * count, count
+
+    def record_view(self, user_id, item_id, interaction_type='view'):
+        # Lượt xem đã được commit vào user_history: cộng vector item vào hồ sơ đang cache thay vì đọc lại lịch sử.
+        # Chưa có trong cache thì lần gợi ý sau dựng từ DB (đã có lượt này); invalidate để lần dựng đang chạy dở không được lưu
+        idx = self.item_id_to_index.get(item_id)
+        if idx is None:
+            return
+        with self._fold_lock:
+            profile = self._profiles.get(user_id)
+            if profile is None:
+                self._profiles.invalidate(user_id)
+                return
+            weight = interaction_weight(interaction_type)
+            vector_sum, weight_total = profile
+            vector_sum = (vector_sum + weight * self.tfidf_matrix[idx]).astype(np.float32)
+            self._profiles.set(user_id, (vector_sum, weight_total + weight))
+
+    @staticmethod
+    def profile_vector(profile):
+        if profile is None:
+            return None
+        vector_sum, weight_total = profile
+        return (vector_sum / weight_total).astype(np.float32)
+
+    def user_vector(self, user_id):
+        return self.profile_vector(self._profiles.get_or_compute(user_id, lambda: self._load_profile(user_id)))
+
+    def recommend(self, user_id, top_n=5, n_probe=None):
+        return self.recommend_vector(self.user_vector(user_id), top_n=top_n, n_probe=n_probe)
+
+    def recommend_vector(self, user_vector, top_n=5, n_probe=None):
+        if user_vector is None:
+            return np.empty(0, dtype=self.item_ids.dtype), np.empty(0)
+        top_indices, scores = self.ann_index.search(user_vector, top_n=top_n, n_probe=n_probe)
+        return self.item_ids[top_indices], scores
+
+
+mind_model_holder = ModelHolder(MODEL_PATH, loader=MindModel.load)
+
+
+def mind_recommendation_ids(user_id, purchased_item_ids, top_n=5, before=None):
+    mind_model = mind_model_holder.get()
+    if mind_model is None:
+        # None (khác danh sách rỗng): model chưa nạp, nơi gọi tự chọn danh sách dự phòng và không lưu cache
+        return None
+
+    if before is None:
+        recommended_item_ids, _ = mind_model.recommend(user_id, top_n=top_n, n_probe=ANN_N_PROBE)
+    else:
+        # Benchmark theo mốc thời gian: hồ sơ chỉ dựng từ tương tác trước mốc, không dùng cache
+        # và hồ sơ lúc train (đã thấy cả các lượt xem sau mốc)
+        user_vector = mind_model.profile_vector(mind_model.history_profile(load_user_history(user_id, before=before)))
+        recommended_item_ids, _ = mind_model.recommend_vector(user_vector, top_n=top_n, n_probe=ANN_N_PROBE)
+    if not len(recommended_item_ids):
+        # User chưa có hồ sơ hành vi: trả bảng xếp hạng phổ biến, bỏ qua item đã mua
+        return get_popular_item_ids(top_n, exclude_ids=purchased_item_ids)
+    return recommended_item_ids.tolist()
+
+
+def get_mind_recommendations(user, top_n=5, before=None):
+    purchased_item_ids = {order.item_id for order in user.orders}
+    return hydrate_items(mind_recommendation_ids(user.id, purchased_item_ids, top_n, before=before) or [])
+
+
+def record_view(user_id, item_id):
+    mind_model = mind_model_holder.get()
+    if mind_model is not None:
+        mind_model.record_view(user_id, item_id)
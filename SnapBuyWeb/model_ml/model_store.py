@@ -0,0 +1,88 @@
+import logging
+import os
+import pickle
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def load_pickle(path):
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+class ModelHolder:
+    # Giữ model đã load trong process; chỉ stat file tối đa mỗi check_interval giây,
+    # khi mtime/size đổi thì load bản mới rồi mới tráo tham chiếu (request đang chạy vẫn dùng bản cũ)
+
+    def __init__(self, path, loader=load_pickle, check_interval=5.0):
+        self.path = path
+        self.loader = loader
+        self.check_interval = check_interval
+        self.version = None
+        self._model = None
+        self._checked_at = None
+        # Phiên bản file load lỗi: không thử lại cho tới khi file đổi, tránh load file hỏng ở mọi request
+        self._failed_version = None
+        self._lock = threading.Lock()
+
+    def _file_version(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self):
+        model = self._model
+        if model is None:
+            # Chưa có model: chờ lock (thread khác có thể đang load lần đầu) thay vì trả None
+            with self._lock:
+                if self._model is None:
+                    self._refresh()
+                return self._model
+
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return model
+
+        version = self._file_version()
+        if version is None or version in (self.version, self._failed_version):
+            self._checked_at = time.monotonic()
+            return model
+
+        with self._lock:
+            self._refresh()
+        return self._model
+
+    def reload(self):
+        with self._lock:
+            self._failed_version = None
+            version = self._file_version()
+            if version is not None:
+                self._swap(version)
+        return self._model
+
+    def _refresh(self):
+        # Gọi khi đang giữ lock
+        version = self._file_version()
+        if version is None or version == self._failed_version:
+            return
+        if version != self.version:
+            self._swap(version)
+        else:
+            self._checked_at = time.monotonic()
+
+    def _swap(self, version):
+        try:
+            model = self.loader(self.path)
+        except Exception:
+            # Giữ bản đang chạy, chỉ thử lại khi file thay đổi
+            logger.exception('Không load được model %s', self.path)
+            self._failed_version = version
+            return
+        # Đặt thời điểm kiểm tra trước khi tráo model: thread đọc thấy model mới thì cũng thấy _checked_at
+        self._checked_at = time.monotonic()
+        self._model, self.version = model, version
+        self._failed_version = None
+        logger.info('Đã load model %s (mtime=%s)', self.path, version[0])
@@ -0,0 +1,155 @@
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from .factor_model import FactorModel
+from .metrics import regression_metrics
+from .rating_snapshot import read_ratings
+
+DEFAULT_FACTORS = 50
+DEFAULT_REG = 0.1
+DEFAULT_ITERATIONS = 10
+# Số ô (dòng x rating, tính cả phần đệm) tối đa trong một lô giải
+SOLVE_CHUNK_SIZE = 65536
+
+# Ma trận rating theo user (CSR) và theo item (CSR của ma trận chuyển vị) của từng worker
+_worker_state = {}
+
+
+def _chunks_by_length(counts, budget):
+    # Sắp các dòng theo số rating rồi gom thành lô có độ dài gần nhau để phần đệm 0 là ít nhất
+    order = np.argsort(counts, kind='stable')
+    chunk_start = 0
+    for pos in range(1, len(order) + 1):
+        if pos == len(order) or (pos - chunk_start + 1) * counts[order[pos]] > budget:
+            yield order[chunk_start:pos]
+            chunk_start = pos
+
+
+def _solve_rows(indptr, indices, data, fixed, fixed_bias, global_mean, reg, start, stop):
+    # Giải đóng cho các dòng [start, stop): mỗi dòng tìm x = [vector; bias] cực tiểu
+    # sum (r - mu - b_fixed - x . [f; 1])^2 + reg * n * |x|^2 với f là vector phía còn lại đang cố định
+    n_dims = fixed.shape[1] + 1
+    features = np.hstack([fixed, np.ones((fixed.shape[0], 1))])
+    row_starts = indptr[start:stop]
+    counts = np.diff(indptr[start:stop + 1])
+    solved = np.zeros((stop - start, n_dims))
+
+    for rows in _chunks_by_length(counts, SOLVE_CHUNK_SIZE):
+        length = counts[rows].max()
+        if length == 0:
+            continue
+        # Đệm mỗi dòng tới cùng độ dài để dựng ma trận Gram của cả lô bằng một phép matmul
+        offsets = np.arange(length)
+        mask = offsets[None, :] < counts[rows][:, None]
+        positions = np.where(mask, row_starts[rows][:, None] + offsets[None, :], 0)
+        cols = indices[positions]
+        z = features[cols] * mask[..., None]
+        target = (data[positions] - global_mean - fixed_bias[cols]) * mask
+
+        z_t = z.transpose(0, 2, 1)
+        gram = z_t @ z
+        rhs = z_t @ target[..., None]
+        gram[:, np.arange(n_dims), np.arange(n_dims)] += reg * counts[rows][:, None]
+        solved[rows] = np.linalg.solve(gram, rhs)[..., 0]
+
+    return solved
+
+
+def _init_worker(by_user, by_item):
+    _worker_state['user'] = by_user
+    _worker_state['item'] = by_item
+
+
+def _solve_block(side, fixed, fixed_bias, global_mean, reg, start, stop):
+    matrix = _worker_state[side]
+    return _solve_rows(matrix.indptr, matrix.indices, matrix.data, fixed, fixed_bias, global_mean, reg, start, stop)
+
+
+def _blocks(n_rows, n_blocks):
+    bounds = np.linspace(0, n_rows, n_blocks + 1).astype(int)
+    return [(start, stop) for start, stop in zip(bounds[:-1], bounds[1:]) if stop > start]
+
+
+def fit_als(user_ids, item_ids, ratings, n_factors=DEFAULT_FACTORS, reg=DEFAULT_REG, n_iter=DEFAULT_ITERATIONS,
+            workers=None, rating_scale=None, random_state=42):
+    # Alternating least squares có bias: cố định item rồi giải đóng cho toàn bộ user, sau đó ngược lại.
+    # Mỗi nửa vòng chia user/item thành các khối liên tiếp và giải song song trên process pool.
+    user_codes, user_uniques = pd.factorize(pd.Series(user_ids), sort=True)
+    item_codes, item_uniques = pd.factorize(pd.Series(item_ids), sort=True)
+    ratings = np.asarray(ratings, dtype=np.float64)
+    n_users, n_items = len(user_uniques), len(item_uniques)
+
+    by_user = sp.csr_matrix((ratings, (user_codes, item_codes)), shape=(n_users, n_items))
+    by_user.sum_duplicates()
+    by_item = by_user.T.tocsr()
+    global_mean = float(ratings.mean())
+    if rating_scale is None:
+        rating_scale = (float(ratings.min()), float(ratings.max()))
+
+    rng = np.random.default_rng(random_state)
+    pu = rng.normal(0, 0.1, (n_users, n_factors))
+    qi = rng.normal(0, 0.1, (n_items, n_factors))
+    bu = np.zeros(n_users)
+    bi = np.zeros(n_items)
+
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(by_user, by_item)) \
+        if workers > 1 else None
+    if executor is None:
+        _init_worker(by_user, by_item)
+
+    def solve(side, n_rows, fixed, fixed_bias):
+        if executor is None:
+            return _solve_block(side, fixed, fixed_bias, global_mean, reg, 0, n_rows)
+        futures = [
+            executor.submit(_solve_block, side, fixed, fixed_bias, global_mean, reg, start, stop)
+            for start, stop in _blocks(n_rows, workers)
+        ]
+        return np.vstack([future.result() for future in futures])
+
+    try:
+        for _ in range(n_iter):
+            solved = solve('user', n_users, qi, bi)
+            pu, bu = solved[:, :-1], solved[:, -1]
+            solved = solve('item', n_items, pu, bu)
+            qi, bi = solved[:, :-1], solved[:, -1]
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    return FactorModel(pu, qi, bu, bi, global_mean, user_uniques.tolist(), item_uniques.tolist(), rating_scale)
+
+
+def rmse(model, user_ids, item_ids, ratings):
+    return regression_metrics(ratings, model.predict(list(user_ids), list(item_ids)))['rmse']
+
+
+def train_als_model(input_path="model_ml/data/ratings.csv", output_path="model_ml/model_als.pkl",
+                    n_factors=DEFAULT_FACTORS, reg=DEFAULT_REG, n_iter=DEFAULT_ITERATIONS, workers=None):
+    if not os.path.exists(input_path):
+        print(f"❌ File không tồn tại: {input_path}")
+        return
+
+    df = read_ratings(input_path)
+    if df.empty:
+        print("⚠️ File rỗng sau khi làm sạch.")
+        return
+
+    test = df.sample(frac=0.2, random_state=42)
+    train = df.drop(test.index)
+
+    start = time.perf_counter()
+    model = fit_als(train["user_id"], train["item_id"], train["rating"], n_factors=n_factors, reg=reg,
+                    n_iter=n_iter, workers=workers, rating_scale=(df["rating"].min(), df["rating"].max()))
+    print(f"⏱️ Train ALS: {time.perf_counter() - start:.2f}s")
+    print(f"📉 RMSE trên tập test: {rmse(model, test['user_id'], test['item_id'], test['rating']):.4f}")
+
+    # Lưu dưới dạng dict hệ số, cùng định dạng mà ratings_recommender đọc
+    with open(output_path, "wb") as f:
+        pickle.dump(model.to_state(), f)
+    print(f"✅ Mô hình đã lưu tại: {output_path}")
+    return model
@@ -0,0 +1,136 @@
+import numpy as np
+import scipy.sparse as sp
+from sklearn.preprocessing import normalize
+from .ranking import top_n_indices
+
+DEFAULT_N_PROBE = 8
+DEFAULT_CENTROID_TERMS = 256
+EXACT_THRESHOLD = 5000
+ASSIGN_BLOCK_SIZE = 8192
+
+
+def _dot(rows, query):
+    # rows: ma trận sparse (M x F); query: vector 1 x F (sparse hoặc dense) -> điểm (M,)
+    if sp.issparse(query):
+        return np.asarray((rows @ query.T).todense()).ravel()
+    return np.asarray(rows @ np.asarray(query).ravel()).ravel()
+
+
+def _truncate_rows(dense, n_terms):
+    # Chỉ giữ n_terms trọng số lớn nhất trên mỗi centroid để centroid vẫn là ma trận thưa
+    n_terms = min(n_terms, dense.shape[1])
+    cols = np.argpartition(-dense, n_terms - 1, axis=1)[:, :n_terms]
+    vals = np.take_along_axis(dense, cols, axis=1)
+    rows = np.repeat(np.arange(dense.shape[0]), n_terms)
+    truncated = sp.csr_matrix((vals.ravel(), (rows, cols.ravel())), shape=dense.shape, dtype=np.float32)
+    truncated.eliminate_zeros()
+    return normalize(truncated)
+
+
+class IVFIndex:
+    # Inverted file index: spherical k-means gom item thành n_lists cụm (centroid thưa, tối đa
+    # centroid_terms từ), lúc truy vấn chỉ tính điểm chính xác cho item trong n_probe cụm gần nhất.
+    # n_probe càng lớn recall càng cao nhưng chậm hơn. Catalog nhỏ hơn exact_threshold thì tìm vét cạn.
+
+    def __init__(self, n_lists=None, n_probe=DEFAULT_N_PROBE, centroid_terms=DEFAULT_CENTROID_TERMS,
+                 exact_threshold=EXACT_THRESHOLD, n_iter=10, random_state=42):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.centroid_terms = centroid_terms
+        self.exact_threshold = exact_threshold
+        self.n_iter = n_iter
+        self.random_state = random_state
+
+        self.matrix = None
+        self.centroids = None
+        self.list_offsets = None
+        self.list_items = None
+        self.list_matrix = None
+
+    @property
+    def is_exact(self):
+        return self.list_items is None
+
+    def fit(self, matrix):
+        self.matrix = sp.csr_matrix(matrix, dtype=np.float32)
+        n_items = self.matrix.shape[0]
+        if n_items <= self.exact_threshold:
+            return self
+
+        rng = np.random.default_rng(self.random_state)
+        n_lists = min(self.n_lists or max(1, int(np.sqrt(n_items))), n_items)
+        data = normalize(self.matrix)
+
+        centroids = data[rng.choice(n_items, n_lists, replace=False)]
+        for _ in range(self.n_iter):
+            assignments = self._assign(data, centroids)
+            members = sp.csr_matrix(
+                (np.ones(n_items, dtype=np.float32), (assignments, np.arange(n_items))),
+                shape=(n_lists, n_items)
+            )
+            sums = (members @ data).toarray()
+            empty = np.flatnonzero(np.bincount(assignments, minlength=n_lists) == 0)
+            if empty.size:
+                sums[empty] = data[rng.choice(n_items, empty.size, replace=False)].toarray()
+            centroids = _truncate_rows(sums, self.centroid_terms)
+
+        assignments = self._assign(data, centroids)
+        self.centroids = centroids
+        self.list_items = np.argsort(assignments, kind='stable').astype(np.int32)
+        self.list_offsets = np.concatenate(([0], np.cumsum(np.bincount(assignments, minlength=n_lists)))).astype(np.int64)
+        self.list_matrix = self.matrix[self.list_items]
+        return self
+
+    @staticmethod
+    def _assign(data, centroids):
+        assignments = np.empty(data.shape[0], dtype=np.int64)
+        centroids_t = centroids.T.tocsc()
+        for start in range(0, data.shape[0], ASSIGN_BLOCK_SIZE):
+            stop = start + ASSIGN_BLOCK_SIZE
+            scores = (data[start:stop] @ centroids_t).toarray()
+            assignments[start:stop] = np.argmax(scores, axis=1)
+        return assignments
+
+    def search(self, query, top_n=5, n_probe=None, exclude=None):
+        if self.is_exact:
+            candidates = np.arange(self.matrix.shape[0])
+            scores = _dot(self.matrix, query)
+        else:
+            probes = top_n_indices(_dot(self.centroids, query), n_probe or self.n_probe)
+            # Item của mỗi cụm nằm liền nhau trong list_matrix nên chỉ cần cắt dòng, không phải gather
+            candidates = np.concatenate([self.list_items[self.list_offsets[l]:self.list_offsets[l + 1]] for l in probes])
+            if candidates.shape[0] < top_n:
+                return IVFIndex.exact(self.matrix).search(query, top_n, exclude=exclude)
+            scores = np.concatenate([
+                _dot(self.list_matrix[self.list_offsets[l]:self.list_offsets[l + 1]], query) for l in probes
+            ])
+
+        if exclude is not None and len(exclude):
+            scores[np.isin(candidates, exclude)] = -np.inf
+
+        top = top_n_indices(scores, top_n)
+        top = top[np.isfinite(scores[top])]
+        return candidates[top], scores[top]
+
+    @classmethod
+    def exact(cls, matrix):
+        return cls(exact_threshold=np.inf).fit(matrix)
+
+    def to_state(self):
+        return {
+            'n_probe': self.n_probe,
+            'centroids': self.centroids,
+            'list_offsets': self.list_offsets,
+            'list_items': self.list_items,
+        }
+
+    @classmethod
+    def from_state(cls, state, matrix):
+        index = cls(n_probe=state['n_probe'])
+        index.matrix = sp.csr_matrix(matrix, dtype=np.float32)
+        index.centroids = state['centroids']
+        index.list_offsets = state['list_offsets']
+        index.list_items = state['list_items']
+        if index.list_items is not None:
+            index.list_matrix = index.matrix[index.list_items]
+        return index
@@ -2,11 +2,11 @@ import pandas as pd
 import pickle
 import os
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from models.neighbor_graph import DEFAULT_TOP_K, DEFAULT_BLOCK_SIZE, build_neighbor_graph
 
 MODEL_PATH = os.path.join('model_ml', 'model_content_based.pkl')
 
-def train_content_model():
+def train_content_model(top_k=DEFAULT_TOP_K, block_size=DEFAULT_BLOCK_SIZE):
     df = pd.read_csv('model_ml/data/items_content.csv') # Đường dẫn tới dataset sản phẩm
 
     # Gộp các đặc trưng dạng văn bản lại thành 1 trường duy nhất
@@ -16,14 +16,19 @@ def train_content_model():
     tfidf = TfidfVectorizer(stop_words='english')
     tfidf_matrix = tfidf.fit_transform(df['combined'])
 
-    # Tính cosine similarity
-    cosine_sim = cosine_similarity(tfidf_matrix, tfidf_matrix)
+    # Tính cosine similarity theo từng khối, mỗi item chỉ giữ top_k láng giềng gần nhất
+    neighbors, scores = build_neighbor_graph(tfidf_matrix, top_k=top_k, block_size=block_size)
 
     # Lưu lại mô hình
     item_ids = df['id'].tolist()
     model_data = {
-        'cosine_sim': cosine_sim,
-        'item_ids': item_ids
+        'neighbors': neighbors,
+        'scores': scores,
+        'item_ids': item_ids,
+        'top_k': neighbors.shape[1],
+        # Giữ lại ma trận TF-IDF và vectorizer để server fold-in item mới mà không cần train lại
+        'tfidf_matrix': tfidf_matrix,
+        'vectorizer': tfidf
     }
 
     with open(MODEL_PATH, 'wb') as f:
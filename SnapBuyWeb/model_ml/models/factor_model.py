@@ -0,0 +1,95 @@
+from collections import namedtuple
+import numpy as np
+
+# qi/bi của một dãy item đã lấy sẵn từ model; item chưa có trong tập train mang vector và bias 0
+ItemFactors = namedtuple('ItemFactors', 'known qi bi')
+
+
+class FactorModel:
+    # Hệ số của mô hình matrix factorization: est = mu + bu + bi + pu . qi (giống SVD của Surprise).
+    # Raw id được chuẩn hoá về str nên user_id kiểu int hay str đều tra được.
+
+    def __init__(self, pu, qi, bu, bi, global_mean, user_ids, item_ids, rating_scale, biased=True):
+        self.pu = np.asarray(pu, dtype=np.float64)
+        self.qi = np.asarray(qi, dtype=np.float64)
+        self.bu = np.asarray(bu, dtype=np.float64)
+        self.bi = np.asarray(bi, dtype=np.float64)
+        self.global_mean = float(global_mean)
+        self.user_ids = [str(raw_id) for raw_id in user_ids]
+        self.item_ids = [str(raw_id) for raw_id in item_ids]
+        self.rating_scale = tuple(rating_scale)
+        self.biased = biased
+
+        self.user_to_inner = {raw_id: inner for inner, raw_id in enumerate(self.user_ids)}
+        self.item_to_inner = {raw_id: inner for inner, raw_id in enumerate(self.item_ids)}
+
+    @classmethod
+    def from_surprise(cls, model):
+        trainset = model.trainset
+        user_ids = [trainset.to_raw_uid(inner) for inner in range(trainset.n_users)]
+        item_ids = [trainset.to_raw_iid(inner) for inner in range(trainset.n_items)]
+        return cls(model.pu, model.qi, model.bu, model.bi, trainset.global_mean,
+                   user_ids, item_ids, trainset.rating_scale, biased=model.biased)
+
+    def to_state(self):
+        return {
+            'pu': self.pu, 'qi': self.qi, 'bu': self.bu, 'bi': self.bi,
+            'global_mean': self.global_mean,
+            'user_ids': self.user_ids, 'item_ids': self.item_ids,
+            'rating_scale': self.rating_scale, 'biased': self.biased,
+        }
+
+    @classmethod
+    def from_state(cls, state):
+        return cls(**state)
+
+    def user_index(self, user_id):
+        return self.user_to_inner.get(str(user_id), -1)
+
+    def item_indices(self, item_ids):
+        return np.fromiter((self.item_to_inner.get(str(item_id), -1) for item_id in item_ids),
+                           dtype=np.int64, count=len(item_ids))
+
+    def item_factors(self, item_inner):
+        item_inner = np.asarray(item_inner, dtype=np.int64)
+        known = item_inner >= 0
+        qi = np.where(known[:, None], self.qi[np.maximum(item_inner, 0)], 0.0)
+        bi = np.where(known, self.bi[np.maximum(item_inner, 0)], 0.0)
+        return ItemFactors(known, qi, bi)
+
+    def _user_factors(self, user_inner):
+        # Vector/bias của user chưa có trong tập train được thay bằng 0
+        user_inner = np.asarray(user_inner, dtype=np.int64)
+        known = user_inner >= 0
+        pu = np.where(known[:, None], self.pu[np.maximum(user_inner, 0)], 0.0)
+        bu = np.where(known, self.bu[np.maximum(user_inner, 0)], 0.0)
+        return known, pu, bu
+
+    def score_users(self, user_inner, items):
+        # Điểm dự đoán cho nhiều user x nhiều item bằng một phép nhân ma trận.
+        # items là chỉ số inner của item hoặc ItemFactors lấy sẵn (CatalogSnapshot giữ cho cả catalog)
+        if not isinstance(items, ItemFactors):
+            items = self.item_factors(items)
+        known_user, pu, bu = self._user_factors(user_inner)
+        est = pu @ items.qi.T
+        if self.biased:
+            est += self.global_mean + bu[:, None] + items.bi[None, :]
+        else:
+            # Surprise trả về trung bình toàn cục khi user hoặc item chưa có trong tập train
+            est = np.where(known_user[:, None] & items.known[None, :], est, self.global_mean)
+        return np.clip(est, *self.rating_scale)
+
+    def score_items(self, user_id, items):
+        return self.score_users([self.user_index(user_id)], items)[0]
+
+    def predict(self, user_ids, item_ids):
+        # Dự đoán cho từng cặp (user, item), dùng khi đánh giá trên tập test
+        user_inner = np.fromiter((self.user_index(user_id) for user_id in user_ids), dtype=np.int64, count=len(user_ids))
+        known_user, pu, bu = self._user_factors(user_inner)
+        items = self.item_factors(self.item_indices(item_ids))
+        est = np.einsum('ij,ij->i', pu, items.qi)
+        if self.biased:
+            est += self.global_mean + bu + items.bi
+        else:
+            est = np.where(known_user & items.known, est, self.global_mean)
+        return np.clip(est, *self.rating_scale)
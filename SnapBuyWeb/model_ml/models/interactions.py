@@ -0,0 +1,7 @@
+# Trọng số theo loại tương tác (loại khác mặc định 1.0); dùng chung cho lúc train và lúc phục vụ
+INTERACTION_WEIGHTS = {'view': 1.0, 'click': 1.0, 'add_to_cart': 2.0, 'purchase': 3.0}
+DEFAULT_INTERACTION_WEIGHT = 1.0
+
+
+def interaction_weight(interaction_type):
+    return INTERACTION_WEIGHTS.get(interaction_type, DEFAULT_INTERACTION_WEIGHT)
@@ -0,0 +1,48 @@
+import numpy as np
+
+
+def regression_metrics(y_true, y_pred):
+    # RMSE/MSE/MAE/R² tính trực tiếp trên mảng numpy
+    y_true = np.asarray(y_true, dtype=np.float64)
+    y_pred = np.asarray(y_pred, dtype=np.float64)
+    errors = y_true - y_pred
+    mse = float(np.mean(errors ** 2))
+    ss_tot = float(np.sum((y_true - y_true.mean()) ** 2))
+    return {
+        'rmse': float(np.sqrt(mse)),
+        'mse': mse,
+        'mae': float(np.mean(np.abs(errors))),
+        'r2': 1 - float(np.sum(errors ** 2)) / ss_tot if ss_tot else 0.0,
+    }
+
+
+def ranking_metrics(recommended, truth_rows, truth_items):
+    # recommended: mảng (U x k) id item đã gợi ý theo thứ tự, đệm -1 nếu thiếu;
+    # (truth_rows, truth_items): các cặp (dòng user, item) thực sự tương tác trong tập test
+    recommended = np.asarray(recommended, dtype=np.int64)
+    truth_rows = np.asarray(truth_rows, dtype=np.int64)
+    truth_items = np.asarray(truth_items, dtype=np.int64)
+    n_users, k = recommended.shape
+    if n_users == 0 or k == 0:
+        return {'precision': 0.0, 'recall': 0.0, 'ndcg': 0.0, 'hit_rate': 0.0}
+
+    # Mã hoá (dòng, item) thành một số nguyên để so khớp cả ma trận bằng một lần isin
+    stride = max(int(recommended.max()), int(truth_items.max(initial=0))) + 1
+    truth_keys = np.unique(truth_rows * stride + truth_items)
+    rows = np.arange(n_users)[:, None]
+    hits = (recommended >= 0) & np.isin(rows * stride + recommended, truth_keys)
+
+    n_relevant = np.bincount(truth_keys // stride, minlength=n_users)
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    ideal = np.concatenate(([0.0], np.cumsum(discounts)))[np.minimum(n_relevant, k)]
+    n_hits = hits.sum(axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        recall = np.where(n_relevant > 0, n_hits / n_relevant, 0.0)
+        ndcg = np.where(ideal > 0, (hits * discounts).sum(axis=1) / ideal, 0.0)
+    return {
+        'precision': float(np.mean(n_hits / k)),
+        'recall': float(np.mean(recall)),
+        'ndcg': float(np.mean(ndcg)),
+        'hit_rate': float(np.mean(n_hits > 0)),
+    }
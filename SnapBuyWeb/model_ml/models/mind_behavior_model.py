@@ -1,18 +1,31 @@
+import os
+import sys
+import numpy as np
 import pandas as pd
+import scipy.sparse as sp
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sqlalchemy import create_engine, inspect
+from sklearn.preprocessing import normalize
 import pickle
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from models.ann_index import IVFIndex
+from models.interactions import DEFAULT_INTERACTION_WEIGHT, INTERACTION_WEIGHTS
+
 # Đường dẫn lưu model
 MODEL_PATH = 'model_ml/model_content_mind.pkl'
 
+# Chu kỳ bán rã (ngày) cho trọng số theo độ mới; None = không giảm theo thời gian
+RECENCY_HALF_LIFE_DAYS = None
+# Số dòng user_history đọc mỗi lần
+HISTORY_CHUNK_SIZE = 100_000
+
 print("[INFO] Đang kết nối database...")
 engine = create_engine('sqlite:///instance/snapbuy.db')
 inspector = inspect(engine)
 print(inspector.get_table_names())
 
-print("[INFO] Đang đọc dữ liệu từ bảng user_history, item, category, brand...")
-history_df = pd.read_sql("SELECT * FROM user_history", engine)
+print("[INFO] Đang đọc dữ liệu từ bảng item, category, brand...")
 item_df = pd.read_sql("SELECT * FROM item", engine)
 category_df = pd.read_sql("SELECT id, name FROM category", engine)
 brand_df = pd.read_sql("SELECT id, name FROM brand", engine)
@@ -38,21 +51,60 @@ print("[INFO] Đang huấn luyện TF-IDF vectorizer...")
 vectorizer = TfidfVectorizer(stop_words='english')
 tfidf_matrix = vectorizer.fit_transform(item_df['description'])
 
+print("[INFO] Xây dựng chỉ mục ANN (IVF) cho ma trận TF-IDF...")
+ann_index = IVFIndex().fit(tfidf_matrix)
+if ann_index.is_exact:
+    print(f"[INFO] Catalog nhỏ ({tfidf_matrix.shape[0]} items), dùng tìm kiếm chính xác.")
+
+print("[INFO] Đang đọc user_history theo từng chunk và dựng ma trận tương tác user x item...")
+now = pd.Timestamp.now(tz='UTC').tz_localize(None)
+chunk_user_ids, chunk_item_indices, chunk_weights = [], [], []
+for chunk in pd.read_sql("SELECT user_id, item_id, interaction_type, timestamp FROM user_history",
+                         engine, chunksize=HISTORY_CHUNK_SIZE):
+    item_indices = chunk['item_id'].map(item_id_to_index)
+    chunk = chunk[item_indices.notna()]
+    weights = chunk['interaction_type'].map(INTERACTION_WEIGHTS) \
+        .fillna(DEFAULT_INTERACTION_WEIGHT).to_numpy(dtype=np.float64)
+    if RECENCY_HALF_LIFE_DAYS:
+        age_days = (now - pd.to_datetime(chunk['timestamp'])).dt.total_seconds().fillna(0).to_numpy() / 86400
+        weights *= np.power(0.5, np.clip(age_days, 0, None) / RECENCY_HALF_LIFE_DAYS)
+
+    chunk_user_ids.append(chunk['user_id'].to_numpy(dtype=np.int64))
+    chunk_item_indices.append(item_indices.dropna().to_numpy(dtype=np.int64))
+    chunk_weights.append(weights)
+
+if chunk_user_ids:
+    history_user_ids = np.concatenate(chunk_user_ids)
+    history_item_indices = np.concatenate(chunk_item_indices)
+    history_weights = np.concatenate(chunk_weights)
+else:
+    history_user_ids = history_item_indices = np.empty(0, dtype=np.int64)
+    history_weights = np.empty(0)
+
+profile_user_ids, user_rows = np.unique(history_user_ids, return_inverse=True)
+interactions = sp.csr_matrix(
+    (history_weights, (user_rows, history_item_indices)),
+    shape=(len(profile_user_ids), tfidf_matrix.shape[0])
+)
+
 print("[INFO] Xây dựng hồ sơ người dùng (user profiles)...")
-user_profiles = {}
-for user_id, group in history_df.groupby('user_id'):
-    viewed_indices = group['item_id'].map(item_id_to_index).dropna().astype(int).tolist()
-    if viewed_indices:
-        user_profiles[user_id] = tfidf_matrix[viewed_indices].mean(axis=0)
+# Hồ sơ = trung bình có trọng số các vector item đã tương tác: chuẩn hoá L1 từng dòng rồi nhân với TF-IDF
+profile_counts = np.asarray(interactions.sum(axis=1)).ravel()
+profile_matrix = (normalize(interactions, norm='l1') @ tfidf_matrix).astype(np.float32).tocsr()
 
 print(f"[INFO] Đang lưu mô hình tại {MODEL_PATH}...")
-with open(MODEL_PATH, 'wb') as f:
+# Ghi ra file tạm rồi đổi tên để server (tự reload theo mtime) không đọc phải file đang ghi dở
+with open(MODEL_PATH + '.tmp', 'wb') as f:
     pickle.dump({
         'tfidf_matrix': tfidf_matrix,
         'vectorizer': vectorizer,
         'item_ids': list(item_df['id']),
-        'user_profiles': user_profiles,
-        'items_df': item_df
+        'profile_matrix': profile_matrix,
+        'profile_user_ids': profile_user_ids.astype(np.int64),
+        'profile_counts': profile_counts.astype(np.float32),
+        'items_df': item_df,
+        'ann_index': ann_index.to_state()
     }, f)
+os.replace(MODEL_PATH + '.tmp', MODEL_PATH)
 
 print("[SUCCESS] Mô hình đã được huấn luyện và lưu thành công!")
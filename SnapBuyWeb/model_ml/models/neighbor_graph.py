@@ -0,0 +1,56 @@
+import numpy as np
+from sklearn.preprocessing import normalize
+
+DEFAULT_TOP_K = 50
+DEFAULT_BLOCK_SIZE = 256
+
+
+def select_top_k(block, k, offset=0):
+    # block: ma trận điểm (B x N) của các dòng [offset, offset + B); bỏ chính item đó ra
+    rows = np.arange(block.shape[0])
+    self_cols = rows + offset
+    inside = self_cols < block.shape[1]
+    block[rows[inside], self_cols[inside]] = -np.inf
+
+    part = np.argpartition(-block, k - 1, axis=1)[:, :k]
+    part_scores = np.take_along_axis(block, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind='stable')
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+
+def build_neighbor_graph(matrix, top_k=DEFAULT_TOP_K, block_size=DEFAULT_BLOCK_SIZE):
+    # Tính cosine theo từng khối dòng, mỗi item chỉ giữ lại top_k láng giềng -> bộ nhớ O(N*K) thay vì O(N^2)
+    matrix = normalize(matrix).astype(np.float32).tocsr()
+    n_items = matrix.shape[0]
+    k = min(top_k, max(n_items - 1, 0))
+
+    neighbors = np.full((n_items, k), -1, dtype=np.int32)
+    scores = np.zeros((n_items, k), dtype=np.float32)
+    if k == 0:
+        return neighbors, scores
+
+    matrix_t = matrix.T.tocsc()
+    for start in range(0, n_items, block_size):
+        stop = min(start + block_size, n_items)
+        block = (matrix[start:stop] @ matrix_t).toarray()
+        neighbors[start:stop], scores[start:stop] = select_top_k(block, k, offset=start)
+
+    return neighbors, scores
+
+
+def graph_from_dense(cosine_sim, top_k=DEFAULT_TOP_K, block_size=DEFAULT_BLOCK_SIZE):
+    # Chuyển artifact dạng ma trận cosine đầy đủ (bản cũ) sang đồ thị top-K
+    n_items = cosine_sim.shape[0]
+    k = min(top_k, max(n_items - 1, 0))
+
+    neighbors = np.full((n_items, k), -1, dtype=np.int32)
+    scores = np.zeros((n_items, k), dtype=np.float32)
+    if k == 0:
+        return neighbors, scores
+
+    for start in range(0, n_items, block_size):
+        stop = min(start + block_size, n_items)
+        block = np.array(cosine_sim[start:stop], dtype=np.float32)
+        neighbors[start:stop], scores[start:stop] = select_top_k(block, k, offset=start)
+
+    return neighbors, scores
@@ -0,0 +1,30 @@
+import numpy as np
+
+
+def top_n_indices(scores, n):
+    # Lấy vị trí của n điểm cao nhất (giảm dần) bằng argpartition, không sort toàn bộ mảng
+    scores = np.asarray(scores)
+    n = min(n, scores.shape[0])
+    if n <= 0:
+        return np.empty(0, dtype=np.intp)
+    if n < scores.shape[0]:
+        idx = np.argpartition(-scores, n - 1)[:n]
+    else:
+        idx = np.arange(scores.shape[0])
+    return idx[np.argsort(-scores[idx], kind='stable')]
+
+
+def top_n_per_row(scores, n):
+    # Top n theo từng dòng của ma trận điểm (B x N): trả về (chỉ số, điểm), mỗi dòng giảm dần
+    scores = np.asarray(scores)
+    n = min(n, scores.shape[1])
+    if n <= 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.intp), empty
+    if n < scores.shape[1]:
+        idx = np.argpartition(-scores, n - 1, axis=1)[:, :n]
+    else:
+        idx = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+    part = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-part, axis=1, kind='stable')
+    return np.take_along_axis(idx, order, axis=1), np.take_along_axis(part, order, axis=1)
@@ -0,0 +1,96 @@
+import glob
+import json
+import os
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+DATABASE_URL = 'sqlite:///instance/snapbuy.db'
+SNAPSHOT_DIR = 'model_ml/data/rating_snapshot'
+EXPORT_CHUNK_SIZE = 50_000
+COLUMNS = ('id', 'user_id', 'item_id', 'rating', 'created_at')
+
+
+def _watermark_path(snapshot_dir):
+    return os.path.join(snapshot_dir, 'watermark.json')
+
+
+def read_watermark(snapshot_dir=SNAPSHOT_DIR):
+    try:
+        with open(_watermark_path(snapshot_dir)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {'last_id': 0, 'last_created_at': None, 'n_rows': 0, 'parts': 0}
+
+
+def _write_watermark(snapshot_dir, watermark):
+    tmp_path = _watermark_path(snapshot_dir) + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(watermark, f)
+    os.replace(tmp_path, _watermark_path(snapshot_dir))
+
+
+def export_ratings(database_url=DATABASE_URL, snapshot_dir=SNAPSHOT_DIR, chunk_size=EXPORT_CHUNK_SIZE):
+    # Đọc bảng rating theo từng chunk (keyset theo id) và chỉ ghi thêm các dòng mới hơn watermark.
+    # Mỗi chunk là một file npz dạng cột; watermark chỉ được cập nhật sau khi file đã ghi xong.
+    os.makedirs(snapshot_dir, exist_ok=True)
+    watermark = read_watermark(snapshot_dir)
+    engine = create_engine(database_url)
+    query = text("SELECT id, user_id, item_id, rating, created_at FROM rating "
+                 "WHERE id > :last_id ORDER BY id LIMIT :limit")
+
+    n_new = 0
+    while True:
+        chunk = pd.read_sql(query, engine, params={'last_id': watermark['last_id'], 'limit': chunk_size})
+        if chunk.empty:
+            break
+
+        created_at = pd.to_datetime(chunk['created_at'], format='ISO8601')
+        part_path = os.path.join(snapshot_dir, f"part-{watermark['parts']:05d}.npz")
+        np.savez(
+            part_path,
+            id=chunk['id'].to_numpy(dtype=np.int64),
+            user_id=chunk['user_id'].to_numpy(dtype=np.int64),
+            item_id=chunk['item_id'].to_numpy(dtype=np.int64),
+            rating=chunk['rating'].to_numpy(dtype=np.float32),
+            created_at=created_at.to_numpy(dtype='datetime64[ns]').astype(np.int64),
+        )
+
+        watermark = {
+            'last_id': int(chunk['id'].iloc[-1]),
+            'last_created_at': max(filter(None, [watermark['last_created_at'], created_at.max().isoformat()])),
+            'n_rows': watermark['n_rows'] + len(chunk),
+            'parts': watermark['parts'] + 1,
+        }
+        _write_watermark(snapshot_dir, watermark)
+        n_new += len(chunk)
+
+    print(f"✅ Đã xuất thêm {n_new} rating, snapshot có {watermark['n_rows']} dòng "
+          f"(id cuối: {watermark['last_id']}, tại {snapshot_dir})")
+    return n_new
+
+
+def load_rating_snapshot(snapshot_dir=SNAPSHOT_DIR):
+    parts = sorted(glob.glob(os.path.join(snapshot_dir, 'part-*.npz')))[:read_watermark(snapshot_dir)['parts']]
+    columns = {name: [] for name in COLUMNS}
+    for part_path in parts:
+        with np.load(part_path) as part:
+            for name in COLUMNS:
+                columns[name].append(part[name])
+
+    df = pd.DataFrame({
+        name: np.concatenate(values) if values else np.empty(0)
+        for name, values in columns.items()
+    })
+    # Một user có thể đánh giá cùng item qua nhiều đơn hàng, chỉ giữ lần đánh giá mới nhất
+    return df.sort_values('id').drop_duplicates(['user_id', 'item_id'], keep='last').reset_index(drop=True)
+
+
+def read_ratings(input_path):
+    # Dữ liệu train: thư mục snapshot xuất từ DB, hoặc file csv kiểu MovieLens (userId, movieId, rating)
+    if os.path.isdir(input_path):
+        df = load_rating_snapshot(input_path)
+    else:
+        df = pd.read_csv(input_path)
+        df.rename(columns={"userId": "user_id", "movieId": "item_id"}, inplace=True)
+    return df[["user_id", "item_id", "rating"]]
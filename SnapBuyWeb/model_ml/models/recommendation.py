@@ -1,12 +1,16 @@
 import pickle
 import os
+from models.neighbor_graph import graph_from_dense
 
 MODEL_PATH = os.path.join('model_ml', 'model_content_based.pkl')
 
 with open(MODEL_PATH, 'rb') as f:
     model_data = pickle.load(f)
 
-cosine_sim = model_data['cosine_sim']
+if 'cosine_sim' in model_data:
+    neighbors, scores = graph_from_dense(model_data['cosine_sim'])
+else:
+    neighbors, scores = model_data['neighbors'], model_data['scores']
 item_ids = model_data['item_ids']
 
 id_to_index = {item_id: idx for idx, item_id in enumerate(item_ids)}
@@ -18,9 +22,6 @@ def get_similar_items(item_id, top_n=5):
         return []
 
     idx = id_to_index[item_id]
-    sim_scores = list(enumerate(cosine_sim[idx]))
-    sim_scores = sorted(sim_scores, key=lambda x: x[1], reverse=True)
-
-    # Bỏ chính nó đi
-    similar_indices = [i for i, _ in sim_scores[1:top_n + 1]]
+    # Láng giềng đã được sắp xếp sẵn khi train (không gồm chính nó)
+    similar_indices = [i for i in neighbors[idx, :top_n] if i >= 0]
     return [index_to_id[i] for i in similar_indices]
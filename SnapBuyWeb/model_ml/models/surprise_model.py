@@ -1,8 +1,8 @@
-import pandas as pd
 from surprise import Dataset, Reader, SVD
 from surprise.model_selection import train_test_split
 import pickle
 import os
+from .rating_snapshot import read_ratings
 
 def train_surprise_model(input_path="model_ml/data/ratings.csv", output_path="model_ml/model_surprise.pkl"):
     if not os.path.exists(input_path):
@@ -10,10 +10,8 @@ def train_surprise_model(input_path="model_ml/data/ratings.csv", output_path="mo
         return
 
     try:
-        # Bản mới đã có header, dùng dấu phẩy
-        df = pd.read_csv(input_path)
-        df.rename(columns={"userId": "user_id", "movieId": "item_id"}, inplace=True)
-        df = df[["user_id", "item_id", "rating"]]  # Bỏ timestamp
+        # input_path là file csv (có header, dấu phẩy) hoặc thư mục snapshot xuất từ bảng rating
+        df = read_ratings(input_path)
     except Exception as e:
         print(f"❌ Lỗi đọc file: {e}")
         return
@@ -0,0 +1,101 @@
+import itertools
+import os
+import pickle
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from surprise import Dataset, Reader, SVD
+from .factor_model import FactorModel
+from .metrics import regression_metrics
+from .rating_snapshot import SNAPSHOT_DIR, read_ratings
+
+PARAM_GRID = {
+    'n_factors': [50, 100],
+    'n_epochs': [20, 30],
+    'lr_all': [0.005, 0.01],
+    'reg_all': [0.02, 0.1],
+}
+DEFAULT_FOLDS = 5
+
+# Dữ liệu rating của từng worker, nhận 1 lần qua initializer của process pool
+_worker_state = {}
+
+
+def _init_worker(df, rating_scale):
+    _worker_state['df'] = df
+    _worker_state['reader'] = Reader(rating_scale=rating_scale)
+
+
+def _fit_svd(df, reader, params):
+    trainset = Dataset.load_from_df(df[['user_id', 'item_id', 'rating']], reader).build_full_trainset()
+    model = SVD(random_state=42, **params)
+    model.fit(trainset)
+    return model
+
+
+def _evaluate_fold(params, train_idx, test_idx):
+    df = _worker_state['df']
+    start = time.perf_counter()
+    model = _fit_svd(df.iloc[train_idx], _worker_state['reader'], params)
+    fit_time = time.perf_counter() - start
+
+    test = df.iloc[test_idx]
+    predictions = FactorModel.from_surprise(model).predict(test['user_id'].tolist(), test['item_id'].tolist())
+    scores = regression_metrics(test['rating'], predictions)
+    scores['fit_time'] = fit_time
+    return scores
+
+
+def kfold_indices(n_rows, n_splits=DEFAULT_FOLDS, random_state=42):
+    folds = np.array_split(np.random.default_rng(random_state).permutation(n_rows), n_splits)
+    for k in range(n_splits):
+        yield np.concatenate(folds[:k] + folds[k + 1:]), folds[k]
+
+
+# Ghi ra file riêng, không ghi đè model đang phục vụ (model_surprise.pkl do train-model.py tạo)
+def tune_surprise_model(input_path=SNAPSHOT_DIR, output_path="model_ml/model_surprise_tuned.pkl",
+                        results_path="model_ml/tuning_results.csv", param_grid=PARAM_GRID,
+                        n_splits=DEFAULT_FOLDS, workers=None):
+    if not os.path.exists(input_path):
+        print(f"❌ File không tồn tại: {input_path}")
+        return
+
+    df = read_ratings(input_path)
+    if df.empty:
+        print("⚠️ File rỗng sau khi làm sạch.")
+        return
+
+    rating_scale = (df["rating"].min(), df["rating"].max())
+    names = list(param_grid)
+    grid = [dict(zip(names, values)) for values in itertools.product(*(param_grid[name] for name in names))]
+    folds = list(kfold_indices(len(df), n_splits))
+    print(f"🔍 {len(grid)} bộ tham số x {n_splits} fold = {len(grid) * n_splits} lần train")
+
+    # Mỗi cặp (bộ tham số, fold) là một task độc lập trên process pool
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(df, rating_scale)) as executor:
+        futures = [
+            (params, executor.submit(_evaluate_fold, params, train_idx, test_idx))
+            for params in grid
+            for train_idx, test_idx in folds
+        ]
+        rows = [{**params, **future.result()} for params, future in futures]
+    print(f"⏱️ Cross-validation: {time.perf_counter() - start:.2f}s")
+
+    results = pd.DataFrame(rows).groupby(names).agg(
+        rmse=('rmse', 'mean'), rmse_std=('rmse', 'std'), mae=('mae', 'mean'),
+        r2=('r2', 'mean'), fit_time=('fit_time', 'mean'),
+    ).sort_values('rmse').reset_index()
+    results.insert(0, 'rank', np.arange(1, len(results) + 1))
+    results.to_csv(results_path, index=False)
+    print(results.head(10).to_string(index=False))
+    print(f"📄 Bảng kết quả đã lưu tại: {results_path}")
+
+    # Train lại bộ tham số tốt nhất trên toàn bộ dữ liệu
+    best_params = {name: results.loc[0, name].item() for name in names}
+    model = _fit_svd(df, Reader(rating_scale=rating_scale), best_params)
+    with open(output_path, "wb") as f:
+        pickle.dump(model, f)
+    print(f"✅ Tham số tốt nhất {best_params}, mô hình đã lưu tại: {output_path}")
+    return results
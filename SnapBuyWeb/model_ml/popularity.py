@@ -0,0 +1,89 @@
+import threading
+import time
+import numpy as np
+from sqlalchemy import func
+from market import db
+from market.models import Order, Rating
+from model_ml.catalog import get_catalog
+
+# Số "đánh giá ảo" bằng điểm trung bình toàn cục cộng thêm cho mỗi item (Bayesian average)
+PRIOR_WEIGHT = 5
+REFRESH_INTERVAL = 600.0
+MAX_ITEMS = 200
+
+
+class PopularityRanking:
+    # Bảng xếp hạng item theo điểm đánh giá Bayesian, hoà điểm thì xét số đơn hàng
+
+    def __init__(self, item_ids, scores, order_counts):
+        self.item_ids = np.asarray(item_ids, dtype=np.int64)
+        self.scores = np.asarray(scores, dtype=np.float64)
+        self.order_counts = np.asarray(order_counts, dtype=np.int64)
+        self.built_at = time.monotonic()
+
+    def top(self, top_n=5, exclude_ids=()):
+        # Chỉ đọc đầu danh sách đã xếp sẵn, bỏ qua các item đã mua
+        if not exclude_ids:
+            return self.item_ids[:top_n]
+        head = self.item_ids[:top_n + len(exclude_ids)]
+        return head[~np.isin(head, list(exclude_ids))][:top_n]
+
+    @classmethod
+    def build(cls, item_ids, rating_rows, order_rows, prior_weight=PRIOR_WEIGHT, max_items=MAX_ITEMS):
+        item_ids = np.asarray(item_ids, dtype=np.int64)
+        positions = {item_id: pos for pos, item_id in enumerate(item_ids.tolist())}
+
+        rating_sums = np.zeros(len(item_ids))
+        rating_counts = np.zeros(len(item_ids))
+        for item_id, total, count in rating_rows:
+            if item_id in positions:
+                rating_sums[positions[item_id]] = total
+                rating_counts[positions[item_id]] = count
+
+        order_counts = np.zeros(len(item_ids), dtype=np.int64)
+        for item_id, count in order_rows:
+            if item_id in positions:
+                order_counts[positions[item_id]] = count
+
+        global_mean = rating_sums.sum() / rating_counts.sum() if rating_counts.sum() else 0.0
+        scores = (prior_weight * global_mean + rating_sums) / (prior_weight + rating_counts)
+
+        order = np.lexsort((item_ids, -order_counts, -scores))[:max_items]
+        return cls(item_ids[order], scores[order], order_counts[order])
+
+    @classmethod
+    def load(cls):
+        rating_rows = db.session.query(Rating.item_id, func.sum(Rating.rating), func.count(Rating.id)) \
+            .group_by(Rating.item_id).all()
+        order_rows = db.session.query(Order.item_id, func.count(Order.id)) \
+            .group_by(Order.item_id).all()
+        return cls.build(get_catalog().item_ids, rating_rows, order_rows)
+
+
+_ranking = None
+_ranking_lock = threading.Lock()
+
+
+def get_popularity():
+    global _ranking
+    ranking = _ranking
+    if ranking is not None and time.monotonic() - ranking.built_at < REFRESH_INTERVAL:
+        return ranking
+
+    with _ranking_lock:
+        if _ranking is ranking:
+            _ranking = PopularityRanking.load()
+        return _ranking
+
+
+def get_popular_item_ids(top_n=5, exclude_ids=()):
+    return get_popularity().top(top_n, exclude_ids).tolist()
+
+
+def cached_popular_item_ids(top_n=5, exclude_ids=()):
+    # Dùng khi hết thời gian chờ: bảng xếp hạng đã có (kể cả đã cũ) thì không chạm DB.
+    # Worker mới chưa dựng lần nào thì dựng ngay (2 câu GROUP BY, rẻ) thay vì trả carousel rỗng.
+    ranking = _ranking
+    if ranking is None:
+        ranking = get_popularity()
+    return ranking.top(top_n, exclude_ids).tolist()
@@ -1,28 +1,56 @@
 import os
-import pickle
-from market.models import Item
-from sqlalchemy.orm import joinedload
+import numpy as np
+from model_ml.catalog import get_catalog
+from model_ml.hydration import hydrate_items
+from model_ml.model_store import ModelHolder, load_pickle
+from model_ml.models.factor_model import FactorModel
+from model_ml.models.ranking import top_n_indices
+from model_ml.popularity import get_popular_item_ids
 
 BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
-MODEL_PATH = os.path.join(BASE_DIR, 'model_ml', 'model_surprise.pkl')
+# Đặt RATINGS_MODEL_PATH=model_ml/model_als.pkl để phục vụ hệ số từ trainer ALS thay cho SVD của Surprise
+MODEL_PATH = os.environ.get('RATINGS_MODEL_PATH', os.path.join(BASE_DIR, 'model_ml', 'model_surprise.pkl'))
 
-def get_ratings_recommendations(user, top_n=5):
-    if not os.path.exists(MODEL_PATH):
-        return []
 
-    with open(MODEL_PATH, 'rb') as f:
-        model = pickle.load(f)
+def load_factor_model(path):
+    # Artifact có thể là model SVD của Surprise hoặc dict hệ số đã tách sẵn
+    model = load_pickle(path)
+    if isinstance(model, dict):
+        return FactorModel.from_state(model)
+    return FactorModel.from_surprise(model)
 
-    items = Item.query.options(joinedload(Item.orders)).all()
 
-    purchased_item_ids = {order.item_id for order in user.orders}
+ratings_model_holder = ModelHolder(MODEL_PATH, loader=load_factor_model)
+
+
+def rank_items(model, user_id, item_ids, purchased_item_ids, top_n=5, items=None):
+    # items: chỉ số inner hoặc ItemFactors lấy sẵn cho item_ids; None thì tra từ model
+    item_ids = np.asarray(item_ids, dtype=np.int64)
+    if items is None:
+        items = model.item_indices(item_ids)
+    scores = model.score_items(user_id, items)
+    if purchased_item_ids:
+        scores[np.isin(item_ids, list(purchased_item_ids))] = -np.inf
 
-    item_ids = [item.id for item in items if item.id not in purchased_item_ids]
+    top = top_n_indices(scores, top_n)
+    top = top[np.isfinite(scores[top])]
+    return list(zip(item_ids[top].tolist(), scores[top].tolist()))
 
-    predictions = []
-    for item_id in item_ids:
-        pred = model.predict(str(user.id), str(item_id))
-        predictions.append((item_id, pred.est))
+def ratings_recommendation_ids(user_id, purchased_item_ids, top_n=5):
+    model = ratings_model_holder.get()
+    if model is None:
+        # None (khác danh sách rỗng): model chưa nạp, nơi gọi tự chọn danh sách dự phòng và không lưu cache
+        return None
 
-    top_items = sorted(predictions, key=lambda x: x[1], reverse=True)[:top_n]
-    return [Item.query.get(item_id) for item_id, _ in top_items]
+    # SVD chỉ trả về điểm trung bình cho user chưa từng đánh giá, không cần chấm cả catalog
+    if model.user_index(user_id) < 0:
+        return get_popular_item_ids(top_n, exclude_ids=purchased_item_ids)
+
+    catalog = get_catalog()
+    top_items = rank_items(model, user_id, catalog.item_ids, purchased_item_ids, top_n=top_n,
+                           items=catalog.model_factors(model))
+    return [item_id for item_id, _ in top_items]
+
+def get_ratings_recommendations(user, top_n=5):
+    purchased_item_ids = {order.item_id for order in user.orders}
+    return hydrate_items(ratings_recommendation_ids(user.id, purchased_item_ids, top_n) or [])
@@ -1,6 +1,9 @@
+from models.rating_snapshot import SNAPSHOT_DIR, export_ratings
 from models.surprise_model import train_surprise_model
 from models.content_model import train_content_model
 
 if __name__ == "__main__":
-    train_surprise_model()
+    # Chỉ xuất thêm các rating mới so với lần chạy trước, sau đó train trên toàn bộ snapshot
+    export_ratings()
+    train_surprise_model(input_path=SNAPSHOT_DIR)
     train_content_model()
@@ -1,8 +1,8 @@
 import pandas as pd
-import numpy as np
 from surprise import SVD, Dataset, Reader
 from surprise.model_selection import train_test_split
-from surprise import accuracy
+from models.factor_model import FactorModel
+from models.metrics import regression_metrics
 
 df = pd.read_csv('data/ratings.csv')
 
@@ -14,20 +14,11 @@ trainset, testset = train_test_split(data, test_size=0.2, random_state=42)
 model = SVD()
 model.fit(trainset)
 
-predictions = model.test(testset)
+user_ids, item_ids, y_true = zip(*testset)
+y_pred = FactorModel.from_surprise(model).predict(user_ids, item_ids)
+scores = regression_metrics(y_true, y_pred)
 
-rmse = accuracy.rmse(predictions)
-mse = accuracy.mse(predictions)
-mae = accuracy.mae(predictions)
-
-y_true = np.array([pred.r_ui for pred in predictions])
-y_pred = np.array([pred.est for pred in predictions])
-
-ss_res = np.sum((y_true - y_pred) ** 2)
-ss_tot = np.sum((y_true - np.mean(y_true)) ** 2)
-r2 = 1 - (ss_res / ss_tot)
-
-print(f"RMSE: {rmse}")
-print(f"MSE: {mse}")
-print(f"MAE: {mae}")
-print(f"R²: {r2:.4f}")
\ No newline at end of file
+print(f"RMSE: {scores['rmse']}")
+print(f"MSE: {scores['mse']}")
+print(f"MAE: {scores['mae']}")
+print(f"R²: {scores['r2']:.4f}")
\ No newline at end of file
@@ -0,0 +1,14 @@
+import argparse
+from models.rating_snapshot import export_ratings
+from models.svd_tuning import DEFAULT_FOLDS, tune_surprise_model
+
+if __name__ == "__main__":
+    # Chạy từ thư mục SnapBuyWeb: python model_ml/tune-model.py --folds 5 --workers 4
+    parser = argparse.ArgumentParser(description="Dò tham số SVD bằng k-fold cross-validation")
+    parser.add_argument("--folds", type=int, default=DEFAULT_FOLDS)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    # Dò tham số trên cùng snapshot rating của shop mà train-model.py dùng
+    export_ratings()
+    tune_surprise_model(n_splits=args.folds, workers=args.workers)